@@ -4,8 +4,22 @@ import json
 import os
 import argparse
 import math
+import struct
+import io
+import mmap
 import hashlib
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import pickle
+import zipfile
+import codecs
+import collections
+import collections.abc
+import weakref
+import gc
+import threading
+import contextlib
+import warnings
 import large_structure_index
 
 # ==========================================
@@ -19,6 +33,13 @@ try:
 except ImportError:
     HAS_SAFETENSORS = False
 
+# NumPy (可选，连续 float32/float64 Tensor 的统计量走零拷贝 numpy 视图)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 # JAX / Orbax
 try:
     import jax
@@ -28,29 +49,377 @@ try:
 except ImportError:
     HAS_JAX = False
 
+# 旧版 orbax-checkpoint 没有 PLACEHOLDER，无法只恢复单个叶子，只能整体恢复
+HAS_ORBAX_PLACEHOLDER = HAS_JAX and hasattr(ocp, "PLACEHOLDER")
+
+# orjson (可选，C 实现的 JSON 序列化)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # ==========================================
 # 0. 通用辅助函数
 # ==========================================
 
+# 预览只取展平后首尾各这么多个元素
+PREVIEW_EDGE_ITEMS = 32
+
+# 元素数超过该阈值的 Tensor，mean/std 改为在采样上计算
+STATS_SAMPLE_THRESHOLD = 16 * 1024 * 1024
+# 采样的目标元素数
+STATS_SAMPLE_SIZE = 1024 * 1024
+
+# 元素数不少于该值 (且未采样) 的非 float32/float64 Tensor，分块计算统计量
+STATS_STREAM_THRESHOLD = 1024 * 1024
+# 分块大小：转换成 float32 后约 16 MiB
+STATS_CHUNK_ELEMS = 4 * 1024 * 1024
+
+# 不小于该字节数的 safetensors Tensor，统计量交给 server 的进程池计算 (不与其它请求争抢 GIL)
+PROCESS_INSPECT_MIN_BYTES = 256 * 1024 * 1024
+
 
 #  辅助函数：将扁平的 Key 路径插入到嵌套字典中
 #  输入: parts=['model', 'layer', '0', 'weight'], info={...}
 #  效果: tree['model']['layer']['0']['weight'] = info
 def insert_into_tree(tree, parts, info):
-    """递归构建树状结构"""
-    key = parts[0]
-    if len(parts) == 1:
-        # 到达叶子节点
-        tree[key] = info
-    else:
+    """沿 parts 逐层下降构建树状结构 (迭代实现，避免递归和列表切片)"""
+    node = tree
+    last = len(parts) - 1
+    for i in range(last):
+        key = parts[i]
+        child = node.get(key)
         # 如果当前层级不存在，或者是个叶子节点（冲突了），初始化为字典
-        if key not in tree or not isinstance(tree[key], dict):
-            tree[key] = {}
-        # 递归下一层
-        insert_into_tree(tree[key], parts[1:], info)
+        if child is None or not isinstance(child, dict):
+            child = node[key] = {}
+        node = child
+    # 到达叶子节点
+    node[parts[last]] = info
+
+def build_tree_from_flat_keys(items):
+    """
+    把 (flat_key, info) 序列批量构建成嵌套树，效果等同于逐个调用 insert_into_tree。
+    相邻 key 通常共享很长的前缀 (如 model.layers.N.*)，
+    因此缓存上一个 key 的路径节点，只从公共前缀之后开始下降/创建。
+    """
+    tree = {}
+    prev_parts = ()
+    prev_depth = 0
+    # path_nodes[i] 为 prev_parts[:i] 对应的节点
+    path_nodes = [tree]
+    push = path_nodes.append
+    for flat_key, info in items:
+        parts = flat_key.split('.')
+        # 目录层数 (最后一段是叶子名)，不再切片出 parts[:-1]
+        depth = len(parts) - 1
+        # 计算与上一个 key 的公共目录前缀长度
+        common = 0
+        limit = depth if depth < prev_depth else prev_depth
+        while common < limit and prev_parts[common] == parts[common]:
+            common += 1
+        if common < prev_depth:
+            del path_nodes[common + 1:]
+        node = path_nodes[common]
+        for i in range(common, depth):
+            key = parts[i]
+            child = node.get(key)
+            # 如果当前层级不存在，或者是个叶子节点（冲突了），初始化为字典
+            if child is None or not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+            push(node)
+        node[parts[depth]] = info
+        prev_parts = parts
+        prev_depth = depth
+    return tree
+
+def parse_key_path(key_path):
+    """
+    解析前端传来的 key 路径：JSON 列表 (如 '["policy", "net.0.weight"]') 才走 json.loads，
+    普通的 "a.b.c" 字符串直接按 '.' 拆分，省去一次 JSON 解析
+    """
+    if key_path.lstrip()[:1] == "[":
+        return json.loads(key_path)
+    return key_path.split('.')
+
+def parse_leaf_ref(key_path):
+    """
+    识别前端直接传来的叶子编号: '{"_idx": 3, "keys": ["policy", "net.0.weight"]}' (或已解析的 dict)。
+    返回 (idx, keys, 旧格式 key 路径)：idx 为结构摘要中该 Tensor 的 "_idx"，keys 用于校验编号，
+    编号不可用或与 keys 不符时按旧格式 key 路径查找；不是这种格式的 key 返回 (None, None, key_path)
+    """
+    if isinstance(key_path, dict):
+        ref = key_path
+    elif isinstance(key_path, str) and key_path.lstrip()[:1] == "{":
+        ref = json.loads(key_path)
+    else:
+        return None, None, key_path
+    idx = ref.get("_idx")
+    if not isinstance(idx, int) or isinstance(idx, bool):
+        idx = None
+    keys = ref.get("keys")
+    if not isinstance(keys, list):
+        return idx, None, None
+    return idx, keys, json.dumps(keys, ensure_ascii=False)
+
+def _leaf_ref_key_error(key_path, idx):
+    """编号不可用、又没有 key 路径可以回退时的 KeyError，报出前端请求的 key"""
+    requested = key_path if isinstance(key_path, str) else json.dumps(key_path, ensure_ascii=False)
+    detail = f" (leaf index {idx} is not available)" if idx is not None else ""
+    return KeyError(f"Key not found: {requested}{detail}")
+
+def _orjson_default(obj):
+    # orjson 只原生支持 tuple 本身，torch.Size 这类 tuple 子类转成 list
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def _orjson_bytes(obj, option=0):
+    """用 orjson 序列化为 UTF-8 bytes；orjson 不可用或序列化失败时返回 None"""
+    if not HAS_ORJSON:
+        return None
+    try:
+        # OPT_NON_STR_KEYS: optimizer state 等字典的 key 可能是 int
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS | option)
+    except TypeError:
+        return None
+
+def dumps_json(obj):
+    """序列化为紧凑 JSON 字符串：优先 orjson，不可用或失败时回退到标准库 json"""
+    data = _orjson_bytes(obj)
+    if data is not None:
+        return data.decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def dumps_json_bytes(obj):
+    """序列化为紧凑的 UTF-8 JSON bytes (HTTP 响应体)：优先 orjson，省去 str -> bytes 的再编码"""
+    data = _orjson_bytes(obj)
+    if data is not None:
+        return data
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def write_json(obj, stream=None):
+    """
+    把 obj 以紧凑 JSON + 换行写入 stream (默认 stdout)，不额外构造完整的 Python str：
+    orjson 直接把 bytes 写入底层 buffer；标准库回退时用 json.dump 分块写出
+    """
+    stream = stream or sys.stdout
+    data = _orjson_bytes(obj, orjson.OPT_APPEND_NEWLINE if HAS_ORJSON else 0)
+    if data is not None and hasattr(stream, "buffer"):
+        stream.flush()
+        stream.buffer.write(data)
+        stream.buffer.flush()
+        return
+    json.dump(obj, stream, ensure_ascii=False, separators=(',', ':'))
+    stream.write("\n")
+    stream.flush()
+
+def _torch_version_at_least(major, minor):
+    try:
+        parts = torch.__version__.split('+')[0].split('.')
+        return (int(parts[0]), int(parts[1])) >= (major, minor)
+    except (ValueError, IndexError):
+        # 无法解析的版本号 (自编译等)：按支持处理，由调用方的 TypeError 回退兜底
+        return True
+
+# torch.load(mmap=True) 从 PyTorch 2.1 开始支持
+TORCH_SUPPORTS_MMAP = _torch_version_at_least(2, 1)
+
+# 网络 / 远程文件系统类型 (Linux /proc/mounts 中的 fstype)
+_NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre",
+    "fuse.sshfs", "fuse.s3fs", "fuse.gcsfuse", "fuse.rclone", "fuse.juicefs",
+}
+# 网络文件系统上无法 mmap 加载、且小于该大小的文件，先整块顺序读入内存再交给 torch.load
+# (整块读入期间峰值内存约为文件大小的两倍)
+BULK_READ_MAX_BYTES = 1024 ** 3
+
+def is_network_path(file_path):
+    """粗略判断文件是否位于网络文件系统上 (Windows UNC 路径 / Linux 网络挂载点)"""
+    # Windows UNC 路径: \\server\share\...
+    if file_path.startswith("\\\\"):
+        return True
+    path = os.path.realpath(file_path)
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = f.read().splitlines()
+    except OSError:
+        return False
+    # 取最长匹配的挂载点
+    best_mount, best_fstype = "", None
+    for line in mounts:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace("\\040", " ")
+        prefix = mount_point.rstrip("/") + "/"
+        if (path == mount_point or path.startswith(prefix)) and len(mount_point) > len(best_mount):
+            best_mount, best_fstype = mount_point, fields[2]
+    return best_fstype in _NETWORK_FS_TYPES
+
+def loads_json(data):
+    """
+    解析 JSON bytes。orjson 可用时直接解析 bytes / memoryview (mmap 视图也不复制)，
+    否则退回标准库 json。解析失败均抛出 json.JSONDecodeError (orjson 的异常是其子类)
+    """
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+_GC_PAUSE_LOCK = threading.Lock()
+_GC_PAUSE_DEPTH = 0
+_GC_WAS_ENABLED = False
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    批量创建大量叶子 dict 时暂停循环垃圾回收：这些对象之间没有循环引用，
+    按分配次数反复触发的分代扫描只是白白耗时 (10 万级 key 的索引能占一半时间)。
+    多线程 / 嵌套使用时由最后一个退出者恢复原状态
+    """
+    global _GC_PAUSE_DEPTH, _GC_WAS_ENABLED
+    with _GC_PAUSE_LOCK:
+        if _GC_PAUSE_DEPTH == 0:
+            _GC_WAS_ENABLED = gc.isenabled()
+            gc.disable()
+        _GC_PAUSE_DEPTH += 1
+    try:
+        yield
+    finally:
+        with _GC_PAUSE_LOCK:
+            _GC_PAUSE_DEPTH -= 1
+            if _GC_PAUSE_DEPTH == 0 and _GC_WAS_ENABLED:
+                gc.enable()
+
+def read_safetensors_header(file_path):
+    """
+    直接解析 safetensors 文件头，不经过 safe_open。
+    文件格式: 8 字节小端 u64 (header 长度) + JSON header + Tensor 数据
+    返回 { tensor_name: {"dtype", "shape", "data_offsets"} }，已去掉 __metadata__
+    """
+    return _read_safetensors_header(file_path)[0]
+
+def _read_safetensors_header(file_path):
+    """同 read_safetensors_header，另外返回数据区起始偏移 (8 + header 长度)"""
+    with open(file_path, 'rb') as f:
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = loads_json(f.read(header_len))
+    header.pop("__metadata__", None)
+    return header, 8 + header_len
+
+# safetensors 文件头中的 dtype 名 -> torch.dtype (旧版 PyTorch 没有的类型跳过)
+_SAFETENSORS_DTYPES = {
+    name: getattr(torch, attr)
+    for name, attr in (
+        ("F64", "float64"), ("F32", "float32"), ("F16", "float16"), ("BF16", "bfloat16"),
+        ("I64", "int64"), ("I32", "int32"), ("I16", "int16"), ("I8", "int8"),
+        ("U64", "uint64"), ("U32", "uint32"), ("U16", "uint16"), ("U8", "uint8"),
+        ("BOOL", "bool"), ("F8_E4M3", "float8_e4m3fn"), ("F8_E5M2", "float8_e5m2"),
+    )
+    if hasattr(torch, attr)
+}
+
+# 文件以只读方式映射，frombuffer 会提示 buffer 不可写 (每个进程一次)。
+# 映射出的 Tensor 只用于计算统计量和预览，不会被原地修改
+warnings.filterwarnings("ignore", message="The given buffer is not writable", category=UserWarning)
+
+# { torch.dtype: "float32" }，str(dtype).split('.') 的结果按 dtype 记忆
+_DTYPE_STR = {}
+
+def dtype_name(dtype):
+    """torch.float32 -> "float32" """
+    name = _DTYPE_STR.get(dtype)
+    if name is None:
+        name = _DTYPE_STR[dtype] = str(dtype).split('.')[-1]
+    return name
 
-def format_tensor_stats(tensor_obj):
-    """统一生成 Tensor 的统计信息和预览"""
+def _take_flat(tensor_obj, start, stop):
+    """
+    取展平后 [start, stop) 的元素，只读取这些元素本身：
+    非连续 Tensor 不做整块 reshape 拷贝，而是把扁平下标换算成多维下标直接索引
+    """
+    if tensor_obj.is_contiguous():
+        # 连续 Tensor 的 view(-1) 不会拷贝数据
+        return tensor_obj.view(-1)[start:stop]
+    flat_idx = torch.arange(start, stop)
+    coords = []
+    for size in reversed(tensor_obj.shape):
+        coords.append(flat_idx % size)
+        flat_idx = flat_idx // size
+    return tensor_obj[tuple(reversed(coords))]
+
+def _format_tensor_preview(tensor_obj):
+    """
+    只取展平后首尾 PREVIEW_EDGE_ITEMS 个元素生成预览字符串，耗时与 Tensor 大小无关，
+    也不修改 torch.set_printoptions 这种全局状态
+    """
+    def fmt(t):
+        values = t.tolist()
+        if t.is_floating_point():
+            return "[" + ", ".join(f"{v:.4g}" for v in values) + "]"
+        return str(values)
+
+    shape = list(tensor_obj.shape)
+    dtype = dtype_name(tensor_obj.dtype)
+    n = tensor_obj.numel()
+    if n <= 2 * PREVIEW_EDGE_ITEMS:
+        return f"tensor({fmt(_take_flat(tensor_obj, 0, n))}, shape={shape}, dtype={dtype})"
+    head = fmt(_take_flat(tensor_obj, 0, PREVIEW_EDGE_ITEMS))
+    tail = fmt(_take_flat(tensor_obj, n - PREVIEW_EDGE_ITEMS, n))
+    # 首尾各占一行，避免单行过长
+    return f"tensor(head={head},\n       tail={tail},\n       shape={shape}, dtype={dtype})"
+
+def _numpy_stats_view(tensor_obj):
+    """连续的 CPU float32/float64 Tensor 返回共享内存的一维 numpy 数组，否则返回 None"""
+    if not HAS_NUMPY or tensor_obj.dtype not in (torch.float32, torch.float64):
+        return None
+    if tensor_obj.device.type != "cpu" or not tensor_obj.is_contiguous():
+        return None
+    return tensor_obj.detach().view(-1).numpy()
+
+def _streaming_stats(tensor_obj):
+    """
+    分块转换为 float32 计算 (min, max, mean, std)，峰值内存只有一个块。
+    每块用 aminmax + var_mean 各遍历一次，块间按 Welford / Chan 的公式合并 mean 和 M2
+    """
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    min_t = max_t = None
+    for chunk in tensor_obj.reshape(-1).split(STATS_CHUNK_ELEMS):
+        c = chunk.to(dtype=torch.float32)
+        c_min, c_max = torch.aminmax(c)
+        # torch.minimum/maximum 会传播 NaN，与整块计算的行为一致
+        min_t = c_min if min_t is None else torch.minimum(min_t, c_min)
+        max_t = c_max if max_t is None else torch.maximum(max_t, c_max)
+        c_var, c_mean = torch.var_mean(c, unbiased=False)
+        c_n = c.numel()
+        c_mean = c_mean.item()
+        total = n + c_n
+        delta = c_mean - mean
+        mean += delta * c_n / total
+        m2 += c_var.item() * c_n + delta * delta * n * c_n / total
+        n = total
+    std = math.sqrt(m2 / (n - 1)) if n > 1 and m2 >= 0 else None
+    return min_t.item(), max_t.item(), mean, std
+
+def _tensor_stats_key(tensor_obj):
+    """
+    以数据地址标识一个 Tensor：共享同一块 storage 的视图 (相同起点/形状/步长) 命中同一条缓存。
+    仅在持有这些 Tensor 的内容存活期间有效，内容释放时必须一并清空缓存
+    """
+    return (tensor_obj.data_ptr(), tensor_obj.numel(), str(tensor_obj.dtype),
+            tuple(tensor_obj.shape), tuple(tensor_obj.stride()))
+
+def format_tensor_stats(tensor_obj, stats_cache=None, cache_key=None, cache_lock=None):
+    """
+    统一生成 Tensor 的统计信息和预览
+    传入 stats_cache (dict) 时复用之前算过的 stats，只重新生成预览；
+    cache_key 缺省时按 _tensor_stats_key 计算。cache_lock 只保护缓存的读写，统计本身不持锁
+    """
     
     # 辅助函数：将 NaN/Inf 转换为 None (JSON null)
     def clean_float(val):
@@ -75,7 +444,8 @@ def format_tensor_stats(tensor_obj):
              return {
                 "type": "tensor_data",
                 "stats": {"min": None, "max": None, "mean": None, "std": None, "shape": list(data_np.shape), "dtype": str(data_np.dtype)},
-                "preview": "[]"
+                "preview": "[]",
+                "preview_shape": list(data_np.shape)
             }
         
         try:
@@ -101,45 +471,253 @@ def format_tensor_stats(tensor_obj):
             return {
                 "type": "tensor_data",
                 "stats": stats,
-                "preview": preview_str
+                "preview": preview_str,
+                "preview_shape": list(data_np.shape)
             }
         except Exception as e:
              return {"error": f"JAX Stats Error: {str(e)}"}
 
-    # PyTorch 处理逻辑 (保持原样)
-    # 1. 基础数据准备
-    t_float = tensor_obj.to(dtype=torch.float32)
-    
-    # 2. 计算统计量
-    if t_float.numel() == 0:
+    # PyTorch 处理逻辑
+    if stats_cache is not None:
+        if cache_key is None:
+            cache_key = _tensor_stats_key(tensor_obj)
+        with cache_lock or contextlib.nullcontext():
+            stats = stats_cache.get(cache_key)
+        if stats is not None:
+            return {
+                "type": "tensor_data",
+                "stats": dict(stats),
+                "preview": _format_tensor_preview(tensor_obj),
+                "preview_shape": list(tensor_obj.shape)
+            }
+
+    numel = tensor_obj.numel()
+
+    # 计算统计量
+    if numel == 0:
         # 空 Tensor 处理
         stats = {
             "min": None, "max": None, "mean": None, "std": None,
             "shape": list(tensor_obj.shape),
-            "dtype": str(tensor_obj.dtype).split('.')[-1]
+            "dtype": dtype_name(tensor_obj.dtype)
         }
 
     else:
-        # 即使只有 1 个元素，PyTorch 计算 std 会返回 nan，
-        # clean_float 会捕获它并变成 None
+        sampled = numel > STATS_SAMPLE_THRESHOLD
+        # 超大 Tensor：不做整块 float32 拷贝
+        # min/max 直接在原始 dtype 上全量计算，mean/std 只在等间隔采样上计算
+        stride = math.ceil(numel / STATS_SAMPLE_SIZE) if sampled else 1
+        # inference_mode 下不记录 autograd 信息 (version counter 等)
+        with torch.inference_mode():
+            arr = _numpy_stats_view(tensor_obj)
+            if arr is not None:
+                # 连续 float32/float64：numpy 每个归约一次性释放 GIL，比 torch 逐个算子更快
+                # 含 inf/nan 时结果与 torch 一致 (inf/nan)，不打印 RuntimeWarning
+                with np.errstate(over='ignore', invalid='ignore'):
+                    min_val, max_val = arr.min(), arr.max()
+                    sample = arr[::stride] if sampled else arr
+                    if sample.size > 1:
+                        # ddof=1 与 torch.std 的无偏估计保持一致
+                        mean_val, std_val = sample.mean(), sample.std(ddof=1)
+                    else:
+                        mean_val, std_val = sample[0], None
+            elif sampled:
+                try:
+                    min_t, max_t = torch.aminmax(tensor_obj)
+                    t_float = tensor_obj.reshape(-1)[::stride].to(dtype=torch.float32)
+                    std_t, mean_t = torch.std_mean(t_float)
+                    min_val, max_val = min_t.item(), max_t.item()
+                    mean_val, std_val = mean_t.item(), std_t.item()
+                except (RuntimeError, NotImplementedError):
+                    # 部分 dtype (如 float8) 不支持 aminmax：分块转换后全量计算，结果是精确值
+                    min_val, max_val, mean_val, std_val = _streaming_stats(tensor_obj)
+                    sampled = False
+            elif numel >= STATS_STREAM_THRESHOLD:
+                # 分块转换 + 合并，不生成整块 float32 拷贝
+                min_val, max_val, mean_val, std_val = _streaming_stats(tensor_obj)
+            else:
+                t_float = tensor_obj.to(dtype=torch.float32)
+                # 两次遍历得到四个统计量：aminmax 同时求 min/max，std_mean 同时求 std/mean
+                min_t, max_t = torch.aminmax(t_float)
+                if numel > 1:
+                    std_t, mean_t = torch.std_mean(t_float)
+                    mean_val, std_val = mean_t.item(), std_t.item()
+                else:
+                    # 只有 1 个元素时 std 没有意义 (无偏估计为 nan)，直接置空
+                    mean_val, std_val = t_float.item(), None
+                min_val, max_val = min_t.item(), max_t.item()
         stats = {
-            "min": clean_float(t_float.min().item()),
-            "max": clean_float(t_float.max().item()),
-            "mean": clean_float(t_float.mean().item()),
-            "std": clean_float(t_float.std().item()), # 这里会自动处理 1 个元素导致的 nan
+            "min": clean_float(min_val),
+            "max": clean_float(max_val),
+            "mean": clean_float(mean_val),
+            "std": clean_float(std_val),
             "shape": list(tensor_obj.shape),
-            "dtype": str(tensor_obj.dtype).split('.')[-1]
+            "dtype": dtype_name(tensor_obj.dtype)
         }
+        if sampled:
+            # 告知前端 mean/std 为采样估计值
+            stats["sampled"] = True
+
+    if stats_cache is not None:
+        with cache_lock or contextlib.nullcontext():
+            stats_cache[cache_key] = dict(stats)
         
-    torch.set_printoptions(edgeitems=3, threshold=50, linewidth=120)
-    preview_str = str(tensor_obj)
+    preview_str = _format_tensor_preview(tensor_obj)
 
     return {
         "type": "tensor_data",
         "stats": stats,
-        "preview": preview_str
+        "preview": preview_str,
+        "preview_shape": list(tensor_obj.shape)
     }
 
+# ==========================================
+# 0.1 轻量结构解析 (只读 data.pkl，不读取 Tensor 数据)
+# ==========================================
+
+class _TensorStub:
+    """结构视图用的 Tensor 占位对象，只携带 dtype 和 shape"""
+    __slots__ = ("dtype", "shape")
+
+    def __init__(self, dtype, shape):
+        self.dtype = dtype
+        self.shape = shape
+
+class _FakeStorage:
+    """Storage (及 find_class 中的 Storage 类型) 的占位，只携带 dtype，不读取 zip 里的真实字节"""
+    __slots__ = ("dtype",)
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+
+def _storage_type_stub(storage_cls):
+    """Storage 类型 -> 携带其 dtype 的 _FakeStorage (无类型 Storage 按字节)；不认识的类型返回 None"""
+    if storage_cls is torch.UntypedStorage:
+        return _FakeStorage(torch.uint8)
+    dtype = getattr(storage_cls, "_dtype", None)
+    return _FakeStorage(dtype) if isinstance(dtype, torch.dtype) else None
+
+def _rebuild_tensor_stub(storage, storage_offset, size, stride, *args):
+    # 对应 torch._utils._rebuild_tensor / _rebuild_tensor_v2
+    return _TensorStub(storage.dtype, tuple(size))
+
+def _rebuild_tensor_v3_stub(storage, storage_offset, size, stride, requires_grad, backward_hooks, dtype, *args):
+    # 对应 torch._utils._rebuild_tensor_v3 (float8 / uint16 等)：Storage 是无类型的，dtype 单独传入
+    return _TensorStub(dtype, tuple(size))
+
+def _rebuild_parameter_stub(data, *args):
+    # Parameter 在结构视图里与普通 Tensor 一致
+    return data
+
+def _rebuild_from_type_stub(func, new_type, args, state):
+    return func(*args)
+
+# 重定向到占位实现的 torch 重建函数
+_LAZY_REBUILD_FUNCS = {
+    ("torch._utils", "_rebuild_tensor"): _rebuild_tensor_stub,
+    ("torch._utils", "_rebuild_tensor_v2"): _rebuild_tensor_stub,
+    ("torch._utils", "_rebuild_tensor_v3"): _rebuild_tensor_v3_stub,
+    ("torch._utils", "_rebuild_parameter"): _rebuild_parameter_stub,
+    ("torch._utils", "_rebuild_parameter_with_state"): _rebuild_parameter_stub,
+    ("torch._tensor", "_rebuild_from_type_v2"): _rebuild_from_type_stub,
+}
+
+class _LazyStructureUnpickler(pickle.Unpickler):
+    """
+    只解析 checkpoint 的对象结构。
+    白名单之外的全局对象一律拒绝 (例如 nn.Module)，由调用方回退到 torch.load，
+    因此不会执行任意代码，安全模式下也可以使用。
+    """
+    def find_class(self, module, name):
+        func = _LAZY_REBUILD_FUNCS.get((module, name))
+        if func is not None:
+            return func
+        if module == "collections" and name == "OrderedDict":
+            return collections.OrderedDict
+        if module == "_codecs" and name == "encode":
+            # protocol 2 下 bytes 通过 _codecs.encode 序列化
+            return codecs.encode
+        if module in ("builtins", "__builtin__") and name in ("set", "frozenset"):
+            return set if name == "set" else frozenset
+        # 以下类型在 pickle 中只作为参数出现，一律返回不会分配内存的占位对象：
+        # 真实的 Storage / Tensor 构造函数可以被构造过的 pickle 用 REDUCE 调用，在只读结构时分配任意大的内存
+        if module == "torch":
+            attr = getattr(torch, name, None)
+            if isinstance(attr, torch.dtype):
+                return attr
+            if name.endswith("Storage") and isinstance(attr, type):
+                stub = _storage_type_stub(attr)
+                if stub is not None:
+                    return stub
+        if module == "torch.storage" and name == "UntypedStorage":
+            # _rebuild_tensor_v3 的 checkpoint 以无类型 Storage 保存
+            return _storage_type_stub(torch.UntypedStorage)
+        if (module, name) in (("torch.nn.parameter", "Parameter"), ("torch._tensor", "Tensor")):
+            return _TensorStub
+        raise pickle.UnpicklingError(f"Unsupported global in lazy structure walk: {module}.{name}")
+
+    def persistent_load(self, saved_id):
+        # saved_id: ('storage', storage_type, key, location, numel)
+        if not isinstance(saved_id, tuple) or len(saved_id) < 2:
+            raise pickle.UnpicklingError(f"Unsupported persistent id: {saved_id!r}")
+        # find_class 已把 Storage 类型换成了 _FakeStorage，这里直接作为 Storage 占位返回
+        storage_type = saved_id[1]
+        if not isinstance(storage_type, _FakeStorage):
+            raise pickle.UnpicklingError(f"Unsupported storage type: {storage_type!r}")
+        return storage_type
+
+def load_structure_lazily(file_path):
+    """
+    打开 .pth (zip 格式) 只读取 data.pkl，Tensor 以 _TensorStub 占位返回。
+    旧版非 zip 格式或包含白名单之外的对象时抛出异常。
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        pkl_name = None
+        for name in zf.namelist():
+            if name == "data.pkl" or name.endswith("/data.pkl"):
+                pkl_name = name
+                break
+        if pkl_name is None:
+            raise pickle.UnpicklingError("data.pkl not found in checkpoint archive")
+        with zf.open(pkl_name) as f:
+            return _LazyStructureUnpickler(f).load()
+
+# 结构摘要中的节点类别
+_KIND_DICT, _KIND_SEQ, _KIND_TENSOR, _KIND_MODULE, _KIND_SCALAR, _KIND_NONE, _KIND_OTHER = range(7)
+
+# 常见类型按 type(x) 直接查表 (一次哈希)，子类等未命中的类型再走 isinstance 判断
+_SUMMARY_KINDS = {
+    dict: _KIND_DICT,
+    collections.OrderedDict: _KIND_DICT,
+    list: _KIND_SEQ,
+    tuple: _KIND_SEQ,
+    torch.Tensor: _KIND_TENSOR,
+    torch.nn.Parameter: _KIND_TENSOR,
+    _TensorStub: _KIND_TENSOR,
+    int: _KIND_SCALAR,
+    float: _KIND_SCALAR,
+    str: _KIND_SCALAR,
+    bool: _KIND_SCALAR,
+    type(None): _KIND_NONE,
+}
+
+# 叶子表路径中的特殊一步：nn.Module 在结构摘要中按 state_dict() 展开
+_STATE_DICT_STEP = object()
+
+def _summary_kind_slow(data):
+    # 判断顺序与查表前的 isinstance 分支保持一致
+    if isinstance(data, dict):
+        return _KIND_DICT
+    if isinstance(data, (list, tuple)):
+        return _KIND_SEQ
+    if torch.is_tensor(data) or isinstance(data, _TensorStub):
+        return _KIND_TENSOR
+    if isinstance(data, torch.nn.Module):
+        return _KIND_MODULE
+    if isinstance(data, (int, float, str, bool)):
+        return _KIND_SCALAR
+    return _KIND_OTHER
+
 # ==========================================
 # 1. 抽象基类 (Interface)
 # ==========================================
@@ -148,6 +726,12 @@ class BaseReader:
     def __init__(self, file_path):
         self.file_path = file_path
         self.content = None
+        # { tensor 标识: stats }，重复点开同一个 key 时不再重新统计
+        self.stats_cache = {}
+        # (请求参数, 序列化好的 /load 响应 bytes)，由 server 填充，重复 /load 直接返回
+        self.load_response_cache = None
+        # server 在多个线程中处理同一文件的请求：各级缓存 (stats / LRU / /load 响应) 的读写都在此锁下进行
+        self.cache_lock = threading.Lock()
 
     def get_structure(self):
         """返回文件的层级结构 (Metadata)"""
@@ -157,17 +741,64 @@ class BaseReader:
         """根据 Key 获取 Tensor 的数值 (Data)"""
         raise NotImplementedError
 
+    def get_tensor_data_batch(self, key_path_jsons):
+        """
+        批量获取多个 Tensor 的数值，返回与输入顺序一致的列表。
+        一次请求内共用已加载的内容和各级缓存；单个 key 出错不影响其它 key
+        """
+        results = []
+        for key_path_json in key_path_jsons:
+            try:
+                results.append(self.get_tensor_data(key_path_json))
+            except Exception as e:
+                results.append({"error": f"Inspect failed: {str(e)}"})
+        return results
+
+    def close(self):
+        """释放缓存的内容 / 文件句柄，下次访问时重新懒加载"""
+        self.content = None
+        with self.cache_lock:
+            self.stats_cache.clear()
+            self.load_response_cache = None
+
+    def _lru_get(self, cache, key):
+        """从按最近使用排序的 OrderedDict 缓存中取值，命中时移到末尾"""
+        with self.cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _lru_put(self, cache, key, value, max_size):
+        """写入 OrderedDict 缓存，超出 max_size 时淘汰最久未使用的条目"""
+        with self.cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+
 # ==========================================
 # 2. PyTorch Reader (.pth / .pt)
 # ==========================================
 
 class TorchReader(BaseReader):
     """专门处理 .pt / .pth"""
+    # 最近查看过的 Tensor 缓存数量 (mmap 下命中即为热页)
+    TENSOR_CACHE_SIZE = 8
+
     def __init__(self, file_path):
         super().__init__(file_path)
         self.allow_unsafe_load = False
         self.export_cache_dir = None
         self.export_cache_key = None
+        # 只用于结构视图的轻量内容 (Tensor 为 _TensorStub 或 meta Tensor)
+        self.lazy_content = None
+        # { tuple(keys): tensor }，按最近使用排序
+        self.tensor_cache = collections.OrderedDict()
+        # { nn.Module: state_dict }，避免按 key 查找时反复遍历子模块
+        self.state_dict_cache = weakref.WeakKeyDictionary()
+        # 结构摘要里第 i 个 Tensor ("_idx": i) 在原始对象中的路径 (保留 int / str 原类型)
+        self._leaf_table = None
         self.last_structure_meta = {
             "truncated": False,
             "full_structure_path": None,
@@ -180,6 +811,12 @@ class TorchReader(BaseReader):
             self.allow_unsafe_load = new_value
             # 模式切换后必须让下次读取重新 load，避免复用旧内容
             self.content = None
+            self.lazy_content = None
+            self._leaf_table = None
+            with self.cache_lock:
+                self.tensor_cache.clear()
+                self.stats_cache.clear()
+            self.state_dict_cache.clear()
 
     def set_export_cache_dir(self, cache_dir):
         if cache_dir and isinstance(cache_dir, str):
@@ -196,21 +833,86 @@ class TorchReader(BaseReader):
         base_key = f"{self.file_path}|{stats.st_mtime_ns}|{stats.st_size}|{self.allow_unsafe_load}"
         return hashlib.md5(base_key.encode("utf-8")).hexdigest()
 
+    def close(self):
+        """
+        mmap=True 加载时 storage 映射到文件上，只有 content 和所有缓存的 Tensor 引用都释放后才会 unmap，
+        因此这里要清空全部缓存；/release 随后执行 gc.collect() 回收循环引用
+        """
+        super().close()
+        self.lazy_content = None
+        self._leaf_table = None
+        with self.cache_lock:
+            self.tensor_cache.clear()
+        self.state_dict_cache.clear()
+
+    def _bulk_read_buffer(self):
+        """
+        文件位于网络文件系统、且无法 mmap 按需读取时 (旧版 PyTorch / 非 zip 格式，torch.load 反正要读完整个文件)，
+        先一次性顺序读入内存，避免 torch.load 在高延迟的文件句柄上发起大量小块随机读。
+        可以 mmap 时不整块读入：只有被查看的 Tensor 才会读盘。其余情况返回 None
+        """
+        if TORCH_SUPPORTS_MMAP and zipfile.is_zipfile(self.file_path):
+            return None
+        if os.path.getsize(self.file_path) >= BULK_READ_MAX_BYTES or not is_network_path(self.file_path):
+            return None
+        with open(self.file_path, 'rb') as f:
+            return io.BytesIO(f.read())
+
+    def _torch_load(self, map_location='cpu', buffer=None, **kwargs):
+        """
+        zip 格式的文件优先使用 mmap=True：storage 按需映射，只有被查看的 Tensor 才会读盘。
+        旧版 PyTorch (<2.1) 不支持 mmap 参数，按版本号直接走普通加载；版本号无法判断时靠 TypeError 回退。
+        传入 buffer (_bulk_read_buffer 读好的文件内容) 时从内存加载，回退重试时复用同一份，不再读第二遍
+        """
+        if buffer is not None:
+            buffer.seek(0)
+            return torch.load(buffer, map_location=map_location, **kwargs)
+        if TORCH_SUPPORTS_MMAP and zipfile.is_zipfile(self.file_path):
+            try:
+                return torch.load(self.file_path, map_location=map_location, mmap=True, **kwargs)
+            except TypeError:
+                pass
+        return torch.load(self.file_path, map_location=map_location, **kwargs)
+
+    def load_meta(self):
+        """
+        只为结构视图加载：storage 全部放到 meta device，不分配内存，shape/dtype 保持不变。
+        返回加载结果，不写入 self.content (meta Tensor 无法用于取数据)。
+        """
+        if self.allow_unsafe_load:
+            return self._torch_load_trusted(map_location='meta')
+        return self._torch_load(map_location='meta', weights_only=True)
+
+    def _torch_load_trusted(self, **kwargs):
+        """
+        不安全模式下的加载：仍然先尝试 weights_only=True。
+        纯 state_dict 走受限 unpickler 更快也更安全；遇到整模型等白名单之外的对象
+        (UnpicklingError / RuntimeError) 再回退到 weights_only=False。
+        """
+        try:
+            return self._torch_load(weights_only=True, **kwargs)
+        except TypeError:
+            # 不支持 weights_only 的旧版 PyTorch
+            return self._torch_load(**kwargs)
+        except (pickle.UnpicklingError, RuntimeError) as e:
+            print(f"[Reader] weights_only load rejected ({type(e).__name__}), falling back to full unpickler: {self.file_path}", file=sys.stderr)
+            return self._torch_load(weights_only=False, **kwargs)
+
     def load(self):
         # map_location='cpu' 防止无 GPU 报错
+        with self.cache_lock:
+            self.tensor_cache.clear()
+            self.stats_cache.clear()
+        self.state_dict_cache.clear()
         if self.allow_unsafe_load:
-            try:
-                # 用户显式信任文件后，启用不安全加载
-                self.content = torch.load(self.file_path, map_location='cpu', weights_only=False)
-            except TypeError:
-                self.content = torch.load(self.file_path, map_location='cpu')
-            except Exception as e:
-                raise e
+            # 用户显式信任文件后，允许回退到不安全加载
+            self.content = self._torch_load_trusted(buffer=self._bulk_read_buffer())
+            self.lazy_content = None
             return
 
         try:
             # 默认优先安全模式
-            self.content = torch.load(self.file_path, map_location='cpu', weights_only=True)
+            self.content = self._torch_load(buffer=self._bulk_read_buffer(), weights_only=True)
         except TypeError:
             raise RuntimeError(
                 "Current PyTorch does not support weights_only. "
@@ -218,76 +920,143 @@ class TorchReader(BaseReader):
             )
         except Exception as e:
             raise e
+        # 完整内容已在内存，轻量结构不再需要
+        self.lazy_content = None
+
+    def _get_structure_source(self):
+        """
+        结构视图的数据来源，依次尝试：
+        已加载的完整内容 -> 只解析 data.pkl -> meta device 加载 -> 完整 load
+        """
+        if self.content is not None:
+            return self.content
+        if self.lazy_content is None:
+            try:
+                self.lazy_content = load_structure_lazily(self.file_path)
+            except Exception:
+                try:
+                    self.lazy_content = self.load_meta()
+                except Exception:
+                    self.load()
+                    return self.content
+        return self.lazy_content
 
-    def _recursive_summary(self, data, depth=0, apply_truncation=True, stats=None):
+    def _recursive_summary(self, data, depth=0, apply_truncation=True, stats=None, leaf_table=None):
+        """
+        生成结构摘要。使用显式工作栈代替递归：
+        深层嵌套 (如 optimizer state) 不会触发递归深度限制，也省去每层的函数调用开销。
+        传入 leaf_table 时，每个 Tensor 的路径按出现顺序追加进去，摘要里附带 "_idx" 编号。
+        """
         if stats is None:
             stats = {"truncated": False}
 
-        # 针对超大元素数目的文件 增加截断逻辑
-        # 1. 限制递归深度，防止极深嵌套导致栈溢出或 JSON 过大
-        if apply_truncation and depth > 20:
-            stats["truncated"] = True
-            return "..."
-        
-        if isinstance(data, dict):
-            # 如果字典太大（比如超过 1000 个键），只显示前 50 个
-            if apply_truncation and len(data) > 1000:
-                stats["truncated"] = True
-                truncated_dict = {}
-                keys = list(data.keys())
-                # 取前 20 个
-                for k in keys[:20]:
-                    truncated_dict[k] = self._recursive_summary(data[k], depth + 1, apply_truncation, stats)
-                
-                # 插入省略提示
-                truncated_dict["__pth__truncated__...__pth__truncated__"] = f"(Total {len(data)} items (including truncated))"
-                
-                # 取后 10 个 (通常看结尾也很重要)
-                for k in keys[-10:]:
-                    truncated_dict[k] = self._recursive_summary(data[k], depth + 1, apply_truncation, stats)
-                return truncated_dict
-            
-            # 正常字典
-            return {k: self._recursive_summary(v, depth + 1, apply_truncation, stats) for k, v in data.items()}
-        
-        elif isinstance(data, (list, tuple)):
-            # 2. 智能截断超长列表
-            # 很多 checkpoint 会保存 layer_wise 的 list，可能长达几千
-            if apply_truncation and len(data) > 1000:
+        root = [None]
+        # 工作栈元素: (输出容器, 在输出容器中的位置, 原始数据, 深度, 路径)
+        # 容器先用 None 占位 (保持 key 顺序)，子节点处理完后回填
+        # 路径是 (父路径, key) 的链，只在遇到 Tensor 时才展开成元组
+        stack = [(root, 0, data, depth, None)]
+        # 热循环中用到的全局/属性查找提前绑定为局部变量
+        pop = stack.pop
+        extend = stack.extend
+        # 本次遍历内按类型记忆分类结果，同一个子类只做一次 isinstance 判断
+        kinds = dict(_SUMMARY_KINDS)
+        kinds_get = kinds.get
+        while stack:
+            parent, slot, data, depth, path = pop()
+            data_type = type(data)
+            kind = kinds_get(data_type)
+            if kind is None:
+                kind = kinds[data_type] = _summary_kind_slow(data)
+
+            # 针对超大元素数目的文件 增加截断逻辑
+            # 1. 限制嵌套深度，防止极深嵌套导致 JSON 过大
+            if apply_truncation and depth > 20:
                 stats["truncated"] = True
-                head = [self._recursive_summary(v, depth + 1, apply_truncation, stats) for v in data[:20]]
-                tail = [self._recursive_summary(v, depth + 1, apply_truncation, stats) for v in data[-10:]]
-                return head + [f"__pth__truncated__............. (Total {len(data)} items (including truncated)) .............__pth__truncated__"] + tail
-            
-            return [self._recursive_summary(v, depth + 1, apply_truncation, stats) for v in data]
-        
-        elif torch.is_tensor(data):
-            return {
-                "_type": "tensor",
-                "dtype": str(data.dtype).split('.')[-1],
-                "shape": list(data.shape),
-                # "__pth_overview_pth__": {},
-            }
-        
-        # === 核心新增：识别 nn.Module 并展开 ===
-        elif isinstance(data, torch.nn.Module):
-            try:
-                # 将模型对象转换为 state_dict (参数字典)
-                # 这样就能看到 model.0.conv.weight 这样的层级结构了
-                return self._recursive_summary(data.state_dict(), 0, apply_truncation, stats) # 递归深度重置，因为这是一个新的逻辑层级
-            except Exception as e:
-                return f"<Model Object: {str(type(data))} (Error expanding: {e})>"
-        # ======================================
-            
-        # === 核心修复：把基本类型的处理加回来 ===
-        elif isinstance(data, (int, float, str, bool)):
-            return data
-        elif data is None:
-            return "None"
-        # ======================================
-        
-        else:
-            return str(type(data))
+                parent[slot] = "..."
+
+            elif kind == _KIND_DICT:
+                # 如果字典太大（比如超过 1000 个键），只显示首尾部分
+                if apply_truncation and len(data) > 1000:
+                    stats["truncated"] = True
+                    keys = list(data.keys())
+                    out = {}
+                    # 取前 20 个
+                    for k in keys[:20]:
+                        out[k] = None
+                    # 插入省略提示
+                    out["__pth__truncated__...__pth__truncated__"] = f"(Total {len(data)} items (including truncated))"
+                    # 取后 10 个 (通常看结尾也很重要)
+                    for k in keys[-10:]:
+                        out[k] = None
+                    child_keys = keys[:20] + keys[-10:]
+                else:
+                    # 正常字典
+                    out = dict.fromkeys(data)
+                    child_keys = data.keys()
+                child_depth = depth + 1
+                # 逆序入栈，出栈顺序即出现顺序 (叶子编号 "_idx" 按此顺序分配)
+                extend([(out, k, data[k], child_depth, (path, k)) for k in reversed(child_keys)])
+                parent[slot] = out
+
+            elif kind == _KIND_SEQ:
+                # 2. 智能截断超长列表
+                # 很多 checkpoint 会保存 layer_wise 的 list，可能长达几千
+                if apply_truncation and len(data) > 1000:
+                    stats["truncated"] = True
+                    children = list(data[:20]) + list(data[-10:])
+                    out = [None] * 31
+                    out[20] = f"__pth__truncated__............. (Total {len(data)} items (including truncated)) .............__pth__truncated__"
+                    slots = list(range(20)) + list(range(21, 31))
+                    indices = list(range(20)) + list(range(len(data) - 10, len(data)))
+                else:
+                    children = data
+                    out = [None] * len(data)
+                    slots = indices = range(len(data))
+                child_depth = depth + 1
+                items = [(out, i, v, child_depth, (path, j)) for i, j, v in zip(slots, indices, children)]
+                items.reverse()
+                extend(items)
+                parent[slot] = out
+
+            elif kind == _KIND_TENSOR:
+                summary = {
+                    "_type": "tensor",
+                    "dtype": dtype_name(data.dtype),
+                    "shape": list(data.shape),
+                    # "__pth_overview_pth__": {},
+                }
+                if leaf_table is not None:
+                    steps = []
+                    while path is not None:
+                        path, k = path
+                        steps.append(k)
+                    steps.reverse()
+                    summary["_idx"] = len(leaf_table)
+                    leaf_table.append(tuple(steps))
+                parent[slot] = summary
+
+            # === 核心新增：识别 nn.Module 并展开 ===
+            elif kind == _KIND_MODULE:
+                try:
+                    # 将模型对象转换为 state_dict (参数字典)
+                    # 这样就能看到 model.0.conv.weight 这样的层级结构了
+                    # 深度重置为 0，因为这是一个新的逻辑层级
+                    stack.append((parent, slot, data.state_dict(), 0, (path, _STATE_DICT_STEP)))
+                except Exception as e:
+                    parent[slot] = f"<Model Object: {str(type(data))} (Error expanding: {e})>"
+            # ======================================
+
+            # === 核心修复：把基本类型的处理加回来 ===
+            elif kind == _KIND_SCALAR:
+                parent[slot] = data
+            elif kind == _KIND_NONE:
+                parent[slot] = "None"
+            # ======================================
+
+            else:
+                parent[slot] = str(type(data))
+
+        return root[0]
 
     def _build_full_structure_export_path(self):
         key_hash = self._compute_export_key()
@@ -305,7 +1074,7 @@ class TorchReader(BaseReader):
         return self.last_structure_meta
 
     def get_structure(self, export_full_artifacts=True):
-        if self.content is None: self.load()
+        source = self._get_structure_source()
         prev_full_structure_path = self.last_structure_meta.get("full_structure_path")
         prev_full_structure_index_path = self.last_structure_meta.get("full_structure_index_path")
         prev_export_error = self.last_structure_meta.get("full_structure_export_error")
@@ -316,7 +1085,9 @@ class TorchReader(BaseReader):
         }
 
         truncate_stats = {"truncated": False}
-        structure = self._recursive_summary(self.content, 0, True, truncate_stats)
+        leaf_table = []
+        structure = self._recursive_summary(source, 0, True, truncate_stats, leaf_table)
+        self._leaf_table = leaf_table
         if not export_full_artifacts:
             self.last_structure_meta = {
                 "truncated": bool(truncate_stats["truncated"]),
@@ -327,7 +1098,7 @@ class TorchReader(BaseReader):
                 self.last_structure_meta["full_structure_export_error"] = prev_export_error
             return structure
 
-        full_structure = structure if not truncate_stats["truncated"] else self._recursive_summary(self.content, 0, False, {"truncated": False})
+        full_structure = structure if not truncate_stats["truncated"] else self._recursive_summary(source, 0, False, {"truncated": False})
         export_path = self._build_full_structure_export_path()
         index_path = self._build_full_structure_index_path()
         try:
@@ -355,14 +1126,30 @@ class TorchReader(BaseReader):
         key_path_json: JSON 字符串，例如 '["policy", "net.0.weight"]'
         """
         if self.content is None: self.load()
+
+        # 前端带了结构摘要里的 "_idx"：直接按叶子表中的路径取，不再逐层猜测 key 类型
+        requested = key_path_json
+        idx, ref_keys, key_path_json = parse_leaf_ref(key_path_json)
+        if idx is not None and self._leaf_table is not None and 0 <= idx < len(self._leaf_table):
+            path = self._leaf_table[idx]
+            # 前端缓存的编号可能来自另一次结构遍历 (reader 更新、lazy / meta 回退路径不同)，与 keys 不符时按 key 路径查找
+            if ref_keys is None or self._leaf_path_matches(path, ref_keys):
+                return self._get_leaf_data(path)
+        if key_path_json is None:
+            raise _leaf_ref_key_error(requested, idx)
         
         # === 核心修改：解析 JSON 列表，而不是 split 字符串 ===
         try:
-            keys = json.loads(key_path_json)
+            keys = parse_key_path(key_path_json)
         except json.JSONDecodeError:
             # 兼容旧逻辑（防守性编程）
             keys = key_path_json.split('.')
-            
+
+        cache_key = tuple(keys)
+        cached = self._lru_get(self.tensor_cache, cache_key)
+        if cached is not None:
+            return format_tensor_stats(cached, self.stats_cache, cache_lock=self.cache_lock)
+
         obj = self.content
         try:
             for k in keys:
@@ -381,8 +1168,11 @@ class TorchReader(BaseReader):
                     # 策略 A: 如果 key 包含点 (例如 "model.0.conv.weight")，说明是 state_dict 的键
                     # 或者是普通的参数名，我们优先查 state_dict
                     try:
-                        # 注意：频繁调用 state_dict() 在大模型上可能稍慢，但在交互式查看时可接受
-                        sd = obj.state_dict()
+                        # state_dict() 会遍历整棵子模块树，按模块缓存，每个模块只生成一次
+                        sd = self.state_dict_cache.get(obj)
+                        if sd is None:
+                            sd = obj.state_dict()
+                            self.state_dict_cache[obj] = sd
                         if k in sd:
                             obj = sd[k]
                             continue
@@ -425,57 +1215,221 @@ class TorchReader(BaseReader):
         if not torch.is_tensor(obj):
             return {"error": "Target is not a Tensor", "value": str(obj)}
 
-        return format_tensor_stats(obj)
+        self._lru_put(self.tensor_cache, cache_key, obj, self.TENSOR_CACHE_SIZE)
+
+        return format_tensor_stats(obj, self.stats_cache, cache_lock=self.cache_lock)
+
+    @staticmethod
+    def _leaf_path_matches(path, keys):
+        """叶子表中的路径 (原始 key 类型) 是否对应前端的字符串 key 路径"""
+        steps = [k for k in path if k is not _STATE_DICT_STEP]
+        if len(steps) != len(keys):
+            return False
+        for step, key in zip(steps, keys):
+            if str(step) != key:
+                return False
+        return True
+
+    def _get_leaf_data(self, path):
+        """按叶子表中的路径取 Tensor：每一步的 key 类型在生成结构时已确定，逐层直接下标访问"""
+        cached = self._lru_get(self.tensor_cache, path)
+        if cached is not None:
+            return format_tensor_stats(cached, self.stats_cache, cache_lock=self.cache_lock)
+
+        obj = self.content
+        try:
+            for k in path:
+                if k is _STATE_DICT_STEP:
+                    sd = self.state_dict_cache.get(obj)
+                    if sd is None:
+                        sd = obj.state_dict()
+                        self.state_dict_cache[obj] = sd
+                    obj = sd
+                else:
+                    obj = obj[k]
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            return {"error": f"Key not found: {[k for k in path if k is not _STATE_DICT_STEP]} (Error: {str(e)})"}
+
+        if not torch.is_tensor(obj):
+            return {"error": "Target is not a Tensor", "value": str(obj)}
+
+        self._lru_put(self.tensor_cache, path, obj, self.TENSOR_CACHE_SIZE)
+
+        return format_tensor_stats(obj, self.stats_cache, cache_lock=self.cache_lock)
 
 # ==========================================
 # 3. Safetensors Reader (.safetensors)
 # ==========================================
 
+def _pop_data_offsets(header):
+    """把文件头各条目的 data_offsets 取出成 { name: [start, end] }，条目里只留 dtype / shape"""
+    return {name: entry.pop("data_offsets", None) for name, entry in header.items()}
+
 class SafetensorsReader(BaseReader):
+
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        # 解析好的结构树：文件头不会变，重复 /load 直接复用
+        self.structure = None
+        # 结构摘要里第 i 个 Tensor ("_idx": i) 对应的扁平 key
+        self._leaf_table = None
+        # get_structure 解析过的 (文件头, data_offsets 表, 数据区起始偏移)，load 映射文件时直接复用，不再解析第二遍
+        self._header = None
+        # 直接映射文件时的 { name: 文件头条目 (dtype, shape) }、{ name: [start, end] } 和数据区起始偏移
+        self.tensor_table = None
+        self.tensor_offsets = None
+        self.data_base = 0
+
+    def close(self):
+        # 映射不能显式 close()：frombuffer 得到的 Tensor 不持有 buffer 导出，提前 unmap 会导致访问野指针。
+        # 这些 Tensor 会引用 mmap 对象本身，只需释放这里的引用，最后一个 Tensor 回收时自动 unmap
+        super().close()
+        self.structure = None
+        self._leaf_table = None
+        self._header = None
+        self.tensor_table = None
+        self.tensor_offsets = None
     
     def load(self):
-        """核心修改：将 safe_open 对象赋值给 self.content 进行缓存，不再使用 with 关闭"""
+        """
+        打开文件并缓存到 self.content，之后每次查看 Tensor 都复用，直到 close() (/release) 为止。
+        默认直接 mmap 文件并解析一次 header，取数据时按 data_offsets 用 torch.frombuffer 零拷贝构造 Tensor，
+        不经过 safetensors 的 Python binding。
+        """
+        with self.cache_lock:
+            self.stats_cache.clear()
+        self.tensor_table = None
+        self.tensor_offsets = None
+        self.content = None
+        # safetensors 数据为小端序，frombuffer 按本机字节序解释
+        if sys.byteorder == "little":
+            try:
+                self._map_file()
+                return
+            except (OSError, ValueError):
+                self.content = None
+                self.tensor_table = None
+                self.tensor_offsets = None
+
         if not HAS_SAFETENSORS:
             raise ImportError("Missing library: safetensors")
-        
         # 注意：safe_open 返回的对象在 Python 引用计数归零时会自动释放资源 (Rust Binding)
         # 所以直接赋值给 self.content 是安全的，只要 Server 端执行 del 操作即可释放
         self.content = safe_open(self.file_path, framework="pt", device="cpu")
 
+    def _map_file(self):
+        with open(self.file_path, 'rb') as f:
+            # ACCESS_READ: 共享只读映射不计入 commit 内存；写时复制的私有映射 (ACCESS_COPY) 按整个文件大小计入，
+            # 关闭 overcommit 或 Windows 下比内存大的文件会映射失败 (ENOMEM)，反而回退到 safe_open
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header_len = struct.unpack('<Q', mm[:8])[0]
+            if self._header is not None and self._header[2] == 8 + header_len:
+                header, offsets = self._header[0], self._header[1]
+            else:
+                header = loads_json(mm[8:8 + header_len])
+                header.pop("__metadata__", None)
+                offsets = _pop_data_offsets(header)
+            if None in offsets.values():
+                raise ValueError("missing data_offsets")
+        except Exception as e:
+            mm.close()
+            raise ValueError(f"Invalid safetensors header: {e}")
+        self.content = mm
+        self.tensor_table = header
+        self.tensor_offsets = offsets
+        self.data_base = 8 + header_len
+
+    def _tensor_from_map(self, flat_key):
+        entry = self.tensor_table.get(flat_key)
+        if entry is None:
+            raise LookupError(f"File does not contain tensor {flat_key}")
+        dtype = _SAFETENSORS_DTYPES.get(entry["dtype"])
+        if dtype is None:
+            # 当前 PyTorch 不认识的 dtype，交给 safetensors 处理
+            if not HAS_SAFETENSORS:
+                raise TypeError(f"Unsupported dtype: {entry['dtype']}")
+            return safe_open(self.file_path, framework="pt", device="cpu").get_tensor(flat_key)
+        shape = entry["shape"]
+        start, end = self.tensor_offsets[flat_key]
+        if end <= start:
+            return torch.empty(shape, dtype=dtype)
+        offset = self.data_base + start
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        if offset % itemsize:
+            # 数据未按元素大小对齐 (旧版写入工具)，只拷贝这一个 Tensor
+            return torch.frombuffer(bytearray(self.content[offset:self.data_base + end]), dtype=dtype).reshape(shape)
+        return torch.frombuffer(self.content, dtype=dtype, count=(end - start) // itemsize, offset=offset).reshape(shape)
+
     def get_structure(self):
-        if not HAS_SAFETENSORS:
-            return {"error": "Missing library: safetensors"}
-        
-        # 1. 懒加载：如果缓存为空，则加载
-        if self.content is None:
-            try:
-                self.load()
-            except Exception as e:
-                return {"error": f"Load failed: {str(e)}"}
-        
-        tree = {}
+        # 结构只依赖文件头里的 dtype/shape，一次读取 + 一次 JSON 解析即可，
+        # 不需要 safe_open，也不需要逐个 key 调用 get_slice
+        if self.structure is not None:
+            return self.structure
         try:
-            # 2. 直接使用缓存的 self.content
-            f = self.content
-            
-            for key in f.keys():
-                slice_info = f.get_slice(key)
-                info = {
-                    "_type": "tensor",
-                    "dtype": str(slice_info.get_dtype()),
-                    "shape": list(slice_info.get_shape()),
-                    "location": "Current File"
-                }
-                # Safetensors 总是扁平 Key，需要构建树
-                insert_into_tree(tree, key.split('.'), info)
+            header, data_base = _read_safetensors_header(self.file_path)
+            # data_offsets 单独存一张表给 _map_file 复用，条目里只剩 dtype / shape
+            offsets = _pop_data_offsets(header)
+            items = []
+            # 与 safe_open.keys() 的顺序保持一致 (按名称排序)，排序后相邻 key 共享前缀
+            leaf_table = sorted(header)
+            for idx, key in enumerate(leaf_table):
+                # 直接复用 JSON 解析得到的条目，原地改成叶子节点，不再为每个 Tensor 新建一个 dict
+                # (映射文件后同一个条目也是 tensor_table 里的 dtype / shape 来源)
+                entry = header[key]
+                entry["_type"] = "tensor"
+                entry["location"] = "Current File"
+                entry["_idx"] = idx
+                items.append((key, entry))
+            # Safetensors 总是扁平 Key，需要构建树
+            tree = build_tree_from_flat_keys(items)
         except Exception as e:
             return {"error": str(e)}
+        self.structure = tree
+        self._leaf_table = leaf_table
+        self._header = (header, offsets, data_base)
         return tree
 
+    def _flat_key(self, key_path_json):
+        requested = key_path_json
+        idx, ref_keys, key_path_json = parse_leaf_ref(key_path_json)
+        if idx is not None and self._leaf_table is not None and 0 <= idx < len(self._leaf_table):
+            flat_key = self._leaf_table[idx]
+            # 编号与 keys 不符 (前端缓存过期) 时按 key 路径查找
+            if ref_keys is None or ".".join(map(str, ref_keys)) == flat_key:
+                return flat_key
+        if key_path_json is None:
+            raise _leaf_ref_key_error(requested, idx)
+        if key_path_json.lstrip()[:1] == "[":
+            # Safetensors 存储的是扁平 Key。
+            # 我们之前构建树时是用 split('.') 拆分的，现在需要用 join('.') 还原
+            return ".".join(json.loads(key_path_json))
+        # 已经是扁平的 "a.b.c"，无需拆分再拼接
+        return key_path_json
+
+    def heavy_inspect_key(self, key_path_json):
+        """
+        该 Tensor 足够大 (>= PROCESS_INSPECT_MIN_BYTES) 且统计量尚未缓存时返回其扁平 key，
+        供 server 转交给独立进程计算；否则返回 None，在当前进程内处理
+        """
+        try:
+            if self.content is None:
+                self.load()
+            if self.tensor_table is None:
+                return None
+            flat_key = self._flat_key(key_path_json)
+        except Exception:
+            return None
+        offsets = self.tensor_offsets.get(flat_key)
+        if offsets is None:
+            return None
+        with self.cache_lock:
+            if flat_key in self.stats_cache:
+                return None
+        start, end = offsets
+        return flat_key if end - start >= PROCESS_INSPECT_MIN_BYTES else None
+
     def get_tensor_data(self, key_path_json):
-        if not HAS_SAFETENSORS:
-            return {"error": "Missing library: safetensors"}
-        
         # 1. 懒加载
         if self.content is None:
             try:
@@ -484,30 +1438,184 @@ class SafetensorsReader(BaseReader):
                 return {"error": f"Load failed: {str(e)}"}
         
         try:
-            keys = json.loads(key_path_json)
-            # Safetensors 存储的是扁平 Key。
-            # 我们之前构建树时是用 split('.') 拆分的，现在需要用 join('.') 还原
-            flat_key = ".".join(keys)
+            flat_key = self._flat_key(key_path_json)
+        except KeyError as e:
+            return {"error": e.args[0]}
         except:
             return {"error": "Invalid JSON key path"}
 
         try:
-            # 2. 直接从缓存句柄读取，极大提升速度
-            f = self.content
-            tensor = f.get_tensor(flat_key)
-            return format_tensor_stats(tensor)
+            # 2. 直接从缓存的映射 / 句柄读取，极大提升速度
+            if self.tensor_table is not None:
+                tensor = self._tensor_from_map(flat_key)
+            else:
+                tensor = self.content.get_tensor(flat_key)
+            # get_tensor 每次返回新的 Tensor，数据地址可能被复用，因此按 key 缓存
+            return format_tensor_stats(tensor, self.stats_cache, flat_key, self.cache_lock)
         except Exception as e:
              return {"error": f"Failed to retrieve tensor: {flat_key} ({str(e)})"}
 
+    def get_tensor_data_batch(self, key_path_jsons):
+        """
+        批量查看时按 Tensor 在文件中的位置 (data_offsets) 依次读取，结果仍按请求顺序返回。
+        safetensors 的 Tensor 在文件中首尾相接，按偏移顺序访问映射基本是一次顺序读，
+        冷缓存下比按 key 字母序来回跳读快得多；读取前后再给内核 readahead / 回收提示
+        """
+        if self.content is None:
+            try:
+                self.load()
+            except Exception:
+                # 由逐个 get_tensor_data 返回加载错误
+                return super().get_tensor_data_batch(key_path_jsons)
+        if self.tensor_table is None:
+            return super().get_tensor_data_batch(key_path_jsons)
+
+        # 找不到的 key 排在最前面，逐个返回错误
+        offsets = []
+        for key_path_json in key_path_jsons:
+            try:
+                offsets.append(self.tensor_offsets.get(self._flat_key(key_path_json)))
+            except Exception:
+                offsets.append(None)
+        order = sorted(range(len(key_path_jsons)), key=lambda i: offsets[i][0] if offsets[i] is not None else -1)
+
+        # 相邻 / 重叠的数据区合并成连续区段
+        runs = []
+        for start, end in sorted(o for o in offsets if o is not None and o[1] > o[0]):
+            if runs and start <= runs[-1][1]:
+                runs[-1][1] = max(runs[-1][1], end)
+            else:
+                runs.append([start, end])
+
+        for start, end in runs:
+            self._advise_range("MADV_SEQUENTIAL", start, end)
+        try:
+            results = [None] * len(key_path_jsons)
+            for i in order:
+                try:
+                    results[i] = self.get_tensor_data(key_path_jsons[i])
+                except Exception as e:
+                    results[i] = {"error": f"Inspect failed: {str(e)}"}
+        finally:
+            # 统计量已缓存，扫过的页不必常驻本进程 (仍留在 page cache 中，再次访问代价很小)
+            for start, end in runs:
+                self._advise_range("MADV_DONTNEED", start, end)
+        return results
+
+    def _advise_range(self, option_name, start, end):
+        """对数据区 [start, end) 所在的映射页发出 madvise 提示；平台不支持时忽略"""
+        option = getattr(mmap, option_name, None)
+        if option is None or not hasattr(self.content, "madvise"):
+            return
+        begin = (self.data_base + start) // mmap.PAGESIZE * mmap.PAGESIZE
+        try:
+            self.content.madvise(option, begin, self.data_base + end - begin)
+        except (OSError, ValueError):
+            pass
+
+def inspect_safetensors_tensor(file_path, flat_key):
+    """
+    在独立 worker 进程中执行：临时映射文件、计算一个 Tensor 的统计量后立即释放，
+    worker 不持有任何文件映射 (Windows 下映射中的文件无法被覆盖/删除)
+    """
+    r = SafetensorsReader(file_path)
+    try:
+        return r.get_tensor_data(flat_key)
+    finally:
+        r.close()
+
 # ==========================================
 # 5. JAX / Orbax Reader (NEW!)
 # ==========================================
 
+def _jax_dict_step(obj, k):
+    if k in obj:
+        return obj[k]
+    # 自动解包 "value" 层（Orbax 特性），在内层继续查找
+    if "value" in obj and k != "value":
+        return _jax_path_step(obj["value"], k)
+    # 数字字符串的 key 可能对应 int 类型的字典 key
+    if isinstance(k, str) and k.isdigit() and int(k) in obj:
+        return obj[int(k)]
+    raise KeyError(k)
+
+def _jax_seq_step(obj, k):
+    if isinstance(k, str) and k.isdigit():
+        return obj[int(k)]
+    return obj[k]
+
+# 按 type(obj) 查表选择下降方式，子类等未命中的类型再走 isinstance 判断
+_JAX_PATH_STEPS = {dict: _jax_dict_step, list: _jax_seq_step, tuple: _jax_seq_step}
+
+def _jax_path_step(obj, k):
+    """沿 PyTree 下降一层"""
+    step = _JAX_PATH_STEPS.get(type(obj))
+    if step is None:
+        if isinstance(obj, collections.abc.Mapping):
+            step = _jax_dict_step
+        elif isinstance(obj, (list, tuple)):
+            step = _jax_seq_step
+        else:
+            return obj[k]
+    return step(obj, k)
+
+# 原样输出的基本类型，按 type(x) 集合查找
+_JAX_SCALAR_TYPES = {int, float, str, bool, type(None)}
+
+# { dtype: str(dtype) }，Array / ArrayMetadata 的 dtype 只有少数几种，按 dtype 记忆
+_JAX_DTYPE_STR = {}
+
+def _canonical_jax_dtype_name(dtype):
+    # 元数据中的标量记录的是 numpy 的 int64/float64，恢复成 jax.Array 后 (未开启 x64 时) 变成 32 位，
+    # 结构视图显示恢复后实际得到的 dtype
+    if not HAS_JAX:
+        return str(dtype)
+    try:
+        return str(jax.dtypes.canonicalize_dtype(dtype))
+    except Exception:
+        return str(dtype)
+
+def _jax_dtype_str(dtype):
+    try:
+        name = _JAX_DTYPE_STR.get(dtype)
+    except TypeError:
+        # 不可哈希的 dtype 对象，不缓存
+        return _canonical_jax_dtype_name(dtype)
+    if name is None:
+        name = _JAX_DTYPE_STR[dtype] = _canonical_jax_dtype_name(dtype)
+    return name
+
+def _jax_metadata_tree(metadata):
+    """
+    ckptr.metadata() 的返回值统一成元数据 PyTree：
+    新版 Orbax 返回 StepMetadata，树在 .item_metadata (TreeMetadata) 的 .tree 里；旧版直接返回树
+    """
+    item = getattr(metadata, "item_metadata", None)
+    if item is not None:
+        metadata = item
+    tree = getattr(metadata, "tree", None)
+    if tree is not None:
+        metadata = tree
+    return metadata
+
 class JaxReader(BaseReader):
-    def load(self):
-        if not HAS_JAX:
-            raise ImportError("JAX/Orbax not installed. Please run: pip install jax orbax-checkpoint")
+    # 单独恢复的叶子缓存数量 (与 TorchReader.TENSOR_CACHE_SIZE 一致)
+    LEAF_CACHE_SIZE = 8
 
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        # Orbax 元数据树 (叶子为带 dtype/shape 的 ArrayMetadata)，结构视图只依赖它
+        self.metadata = None
+        # { tuple(keys): 单独恢复的叶子 Array }，按最近使用排序
+        self.leaf_cache = collections.OrderedDict()
+
+    def close(self):
+        super().close()
+        self.metadata = None
+        with self.cache_lock:
+            self.leaf_cache.clear()
+
+    def _target_path(self):
         # 逻辑：Orbax 加载的是目录。
         # 如果用户选中的是 "checkpoint" 文件，我们取其所在的目录。
         target_path = self.file_path
@@ -519,104 +1627,174 @@ class JaxReader(BaseReader):
             else:
                 # 否则尝试直接加载该目录
                 target_path = dir_path
-        
-        # 强制使用 CPU，防止分配显存导致卡死
+        return target_path
+
+    def _restore_args(self, metadata, pick=None):
+        """
+        构建 restore_args (强制 CPU，防止分配显存导致卡死)。
+        pick 为某个叶子的元数据时，只恢复该叶子，其余叶子用 ocp.PLACEHOLDER 跳过
+        """
         try:
             devices = jax.devices("cpu")
             sharding = jax.sharding.SingleDeviceSharding(devices[0])
         except:
             sharding = None
+        args = ocp.ArrayRestoreArgs(restore_type=jax.Array, sharding=sharding)
+        if pick is None:
+            return jax.tree.map(lambda _: args, metadata)
+        return jax.tree.map(lambda m: args if m is pick else ocp.PLACEHOLDER, metadata)
+
+    def load(self):
+        """只读取 Orbax 元数据 (dtype/shape)，不恢复任何 Array"""
+        if not HAS_JAX:
+            raise ImportError("JAX/Orbax not installed. Please run: pip install jax orbax-checkpoint")
+        with ocp.PyTreeCheckpointer() as ckptr:
+            self.metadata = _jax_metadata_tree(ckptr.metadata(self._target_path()))
+
+    def load_full(self):
+        """恢复整个 Checkpoint 到 self.content (动态展开等需要完整内容的场景)"""
+        if self.metadata is None:
+            self.load()
+        target_path = self._target_path()
 
         # 使用 Orbax 恢复 Checkpoint
         with ocp.PyTreeCheckpointer() as ckptr:
-            # 1. 读取元数据
-            metadata = ckptr.metadata(target_path)
-            
-            # 2. 构建 restore_args (强制 CPU)
-            restore_args = jax.tree.map(
-                lambda _: ocp.ArrayRestoreArgs(
-                    restore_type=jax.Array,
-                    sharding=sharding, 
+            loaded = ckptr.restore(
+                target_path,
+                ocp.args.PyTreeRestore(
+                    item=self.metadata,
+                    restore_args=self._restore_args(self.metadata),
                 ),
-                metadata,
             )
+        self.content = self._unwrap_params(loaded)
 
-            # 3. 恢复数据
-            loaded = ckptr.restore(
-                target_path,
+    def _restore_leaf(self, leaf_meta):
+        """只恢复一个叶子：其余叶子为 PLACEHOLDER，Orbax 不会读取它们的数据 (需要 HAS_ORBAX_PLACEHOLDER)"""
+        item = jax.tree.map(lambda m: m if m is leaf_meta else ocp.PLACEHOLDER, self.metadata)
+        with ocp.PyTreeCheckpointer() as ckptr:
+            restored = ckptr.restore(
+                self._target_path(),
                 ocp.args.PyTreeRestore(
-                    item=metadata,
-                    restore_args=restore_args,
+                    item=item,
+                    restore_args=self._restore_args(self.metadata, pick=leaf_meta),
                 ),
             )
-            
-            # Orbax 经常包一层 "params" key，或者 "value"
-            if "params" in loaded:
-                self.content = loaded["params"]
-            else:
-                self.content = loaded
+        leaves = [x for x in jax.tree_util.tree_leaves(restored) if x is not ocp.PLACEHOLDER]
+        if len(leaves) != 1:
+            raise ValueError(f"Expected one restored leaf, got {len(leaves)}")
+        return leaves[0]
+
+    @staticmethod
+    def _unwrap_params(tree):
+        # Orbax 经常包一层 "params" key，或者 "value"
+        if isinstance(tree, collections.abc.Mapping) and "params" in tree:
+            return tree["params"]
+        return tree
 
     def _recursive_summary(self, data):
-        # 递归处理 PyTree (Dict/List/Array)
-        if isinstance(data, dict):
-            # 处理 Orbax 可能存在的 {"value": Array} 包装
-            if "value" in data and len(data) == 1:
-                return self._recursive_summary(data["value"])
-            return {k: self._recursive_summary(v) for k, v in data.items()}
-        
-        elif isinstance(data, (list, tuple)):
-            return [self._recursive_summary(v) for v in data]
-        
-        elif HAS_JAX and isinstance(data, (jax.Array, np.ndarray)):
-            # JAX Array
-            return {
-                "_type": "tensor",
-                "dtype": str(data.dtype),
-                "shape": list(data.shape),
-                "location": "JAX Checkpoint",
-                # "__pth_overview_pth__": {},
-            }
-        elif isinstance(data, (int, float, str, bool, type(None))):
-            return data
-        else:
-            return str(type(data))
+        """
+        处理 PyTree (Dict/List/Array)。与 TorchReader 一样使用显式工作栈代替递归，
+        深层嵌套不会触发递归深度限制
+        """
+        root = [None]
+        # 工作栈元素: (输出容器, 在输出容器中的位置, 原始数据)
+        stack = [(root, 0, data)]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            parent, slot, data = pop()
+            data_type = type(data)
+
+            if data_type in _JAX_SCALAR_TYPES:
+                parent[slot] = data
+
+            elif isinstance(data, collections.abc.Mapping):
+                # 处理 Orbax 可能存在的 {"value": Array} 包装
+                if "value" in data and len(data) == 1:
+                    stack.append((parent, slot, data["value"]))
+                    continue
+                out = dict.fromkeys(data)
+                extend([(out, k, v) for k, v in data.items()])
+                parent[slot] = out
+
+            elif isinstance(data, (list, tuple)):
+                out = [None] * len(data)
+                extend([(out, i, v) for i, v in enumerate(data)])
+                parent[slot] = out
+
+            elif hasattr(data, "shape") and hasattr(data, "dtype"):
+                # JAX Array / np.ndarray，或 Orbax 元数据中的 ArrayMetadata (同样带 shape/dtype)
+                parent[slot] = {
+                    "_type": "tensor",
+                    "dtype": _jax_dtype_str(data.dtype),
+                    "shape": list(data.shape),
+                    "location": "JAX Checkpoint",
+                    # "__pth_overview_pth__": {},
+                }
+            elif isinstance(data, (int, float, str, bool)):
+                parent[slot] = data
+            else:
+                parent[slot] = str(type(data))
+
+        return root[0]
 
     def get_structure(self):
         try:
-            if self.content is None: self.load()
-            return self._recursive_summary(self.content)
+            # 元数据已包含 dtype/shape，浏览结构不需要恢复任何 Array
+            if self.metadata is None: self.load()
+            return self._recursive_summary(self._unwrap_params(self.metadata))
         except Exception as e:
             return {"error": f"JAX Load Error: {str(e)}"}
 
+    @staticmethod
+    def _resolve_path(obj, keys):
+        for k in keys:
+            obj = _jax_path_step(obj, k)
+        # 末尾可能包裹了 (多层) "value"
+        while isinstance(obj, collections.abc.Mapping) and len(obj) == 1 and "value" in obj:
+            obj = obj["value"]
+        return obj
+
     def get_tensor_data(self, key_path_json):
         try:
-            if self.content is None: self.load()
-            keys = json.loads(key_path_json)
+            if self.metadata is None: self.load()
+            keys = parse_key_path(key_path_json)
         except:
             return {"error": "Invalid JSON key path"}
 
-        obj = self.content
-        try:
-            for k in keys:
-                # 自动解包 "value" 层（Orbax 特性）
-                if isinstance(obj, dict) and "value" in obj and k != "value" and k not in obj:
-                     obj = obj["value"]
+        cache_key = tuple(keys)
+        obj = self._lru_get(self.leaf_cache, cache_key)
+        if obj is not None:
+            return format_tensor_stats(obj)
 
-                if isinstance(obj, (list, tuple)):
-                    if isinstance(k, str) and k.isdigit():
-                        obj = obj[int(k)]
-                    else:
-                        obj = obj[k]
-                else:
-                    obj = obj[k]
-            
-            # 再次检查末尾是否包裹了 "value"
-            if isinstance(obj, dict) and "value" in obj and len(obj) == 1:
-                obj = obj["value"]
-                
+        if self.content is not None:
+            root = self.content
+        else:
+            root = self._unwrap_params(self.metadata)
+        try:
+            obj = self._resolve_path(root, keys)
         except Exception as e:
             return {"error": f"Key not found: {keys} ({str(e)})"}
 
+        # 子树 / 标量等非叶子目标直接报错，不触发任何恢复
+        if isinstance(obj, (dict, list, tuple)):
+            return {"error": "Target is not a Tensor", "value": f"{type(obj).__name__} ({len(obj)} items)"}
+        if not (hasattr(obj, "shape") and hasattr(obj, "dtype")):
+            return {"error": "Target is not a Tensor", "value": str(obj)}
+
+        if self.content is None:
+            try:
+                if HAS_ORBAX_PLACEHOLDER:
+                    # obj 是元数据叶子：只恢复这一个 Array
+                    obj = self._restore_leaf(obj)
+                else:
+                    # 旧版 Orbax 不支持跳过叶子，只能完整恢复
+                    self.load_full()
+                    obj = self._resolve_path(self.content, keys)
+            except Exception as e:
+                return {"error": f"JAX Load Error: {str(e)}"}
+            self._lru_put(self.leaf_cache, cache_key, obj, self.LEAF_CACHE_SIZE)
+
         return format_tensor_stats(obj)
 
 # ==========================================
@@ -648,41 +1826,100 @@ class ReaderFactory:
 # 5. Global Index Logic (Independent)
 # ==========================================
 
+# 并行读取分片文件头的线程数上限
+INDEX_SCAN_WORKERS = 8
+
+def _read_torch_shard_header(shard_path):
+    """
+    pytorch_model-*.bin 分片：只解析 zip 里的 data.pkl 得到 { key: {dtype, shape} }，不读取 Tensor 数据。
+    旧版非 zip 格式或包含白名单之外的对象时返回空字典
+    """
+    try:
+        state = load_structure_lazily(shard_path)
+    except Exception:
+        return {}
+    if not isinstance(state, dict):
+        return {}
+    header = {}
+    for key, value in state.items():
+        if isinstance(value, _TensorStub):
+            header[key] = {"dtype": dtype_name(value.dtype), "shape": list(value.shape)}
+    return header
+
+def _scan_index_shard(shard_path):
+    """读取单个分片的大小和文件头 (只读 header / data.pkl，不读 Tensor 数据)"""
+    try:
+        size = os.path.getsize(shard_path)
+    except OSError:
+        return 0, {}
+    header = {}
+    if shard_path.endswith('.safetensors'):
+        try:
+            header = read_safetensors_header(shard_path)
+        except Exception:
+            header = {}
+    elif shard_path.endswith(('.bin', '.pth', '.pt')):
+        header = _read_torch_shard_header(shard_path)
+    return size, header
+
 def read_global_index(index_path, current_file_name):
     try:
-        with open(index_path, 'r', encoding='utf-8') as f:
-            index_data = json.load(f)
+        # 映射索引文件直接解析，不先读成 str；视图必须在 mmap 关闭前释放
+        with open(index_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                index_data = loads_json(view)
         
         weight_map = index_data.get("weight_map", {})
         
         # ========================================================
-        # 新增逻辑：计算整个模型(所有分片)的总大小
+        # 计算整个模型(所有分片)的总大小，并读取各分片的文件头
         # ========================================================
         total_size = 0
         base_dir = os.path.dirname(index_path)
         
         # 1. 收集所有涉及的唯一文件名 (weight_map values 可能重复，用 set 去重)
-        related_files = set(weight_map.values())
+        related_files = sorted(set(weight_map.values()))
         
-        # 2. 累加所有权重文件的大小
-        for fname in related_files:
-            full_path = os.path.join(base_dir, fname)
-            if os.path.exists(full_path):
-                total_size += os.path.getsize(full_path)
+        # 2. 并行 stat + 读取分片 header：小块随机读在 SSD 上可以并发完成
+        shard_headers = {}
+        if related_files:
+            shard_paths = [os.path.join(base_dir, fname) for fname in related_files]
+            if len(shard_paths) == 1:
+                # 单个分片不值得启动线程池
+                results = [_scan_index_shard(shard_paths[0])]
+            else:
+                workers = min(INDEX_SCAN_WORKERS, len(shard_paths))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_scan_index_shard, shard_paths))
+            for fname, (size, header) in zip(related_files, results):
+                total_size += size
+                shard_headers[fname] = header
                 
         # 3. 加上索引文件本身的大小 (通常很小，但为了严谨)
         if os.path.exists(index_path):
             total_size += os.path.getsize(index_path)
         # ========================================================
 
-        tree = {}
-        for key, filename in weight_map.items():
-            loc_str = "Current File" if filename == current_file_name else f"File: {filename}"
-            info = {
-                "_type": "tensor_ref",
-                "location": loc_str
-            }
-            insert_into_tree(tree, key.split('.'), info)
+        # 同一分片名在 weight_map 中重复成千上万次，位置标签按文件名只生成一次
+        locations = {
+            fname: "Current File" if fname == current_file_name else f"File: {fname}"
+            for fname in related_files
+        }
+        no_header = {}
+        items = []
+        with gc_paused():
+            for key, filename in weight_map.items():
+                # 分片 header 中有该 Tensor 时，原地复用其 {dtype, shape} 作为叶子节点
+                info = shard_headers.get(filename, no_header).get(key)
+                if info:
+                    info.pop("data_offsets", None)
+                else:
+                    info = {}
+                info["_type"] = "tensor_ref"
+                info["location"] = locations[filename]
+                items.append((key, info))
+            # weight_map 本身按 key 有序 (HF 导出时排序)，保持原顺序以免改变前端显示
+            tree = build_tree_from_flat_keys(items)
             
         return {
             "is_global": True, 
@@ -717,10 +1954,10 @@ if __name__ == "__main__":
             # === 获取数据模式 ===
             # 直接使用 Reader 获取数据，因为 Index 文件里没有数据
             if not args.key:
-                print(json.dumps({"error": "Missing --key argument"}))
+                write_json({"error": "Missing --key argument"})
             else:
                 result = reader.get_tensor_data(args.key)
-                print(json.dumps(result, ensure_ascii=False))
+                write_json(result)
 
         else:
             # === 获取结构模式 ===
@@ -745,7 +1982,7 @@ if __name__ == "__main__":
             if found_index:
                 # 使用全局索引逻辑
                 result = read_global_index(found_index, base_name)
-                print(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+                write_json(result)
             else:
                 # 使用 Reader 的本地读取逻辑
                 structure = reader.get_structure()
@@ -754,7 +1991,7 @@ if __name__ == "__main__":
                     "is_global": False,
                     "data": structure
                 }
-                print(json.dumps(result, ensure_ascii=False, separators=(',', ':')))
+                write_json(result)
 
     except Exception as e:
-        print(json.dumps({"error": str(e)}, ensure_ascii=False))
\ No newline at end of file
+        write_json({"error": str(e)})
\ No newline at end of file
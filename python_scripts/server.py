@@ -7,6 +7,20 @@ import urllib.parse
 import signal  # <--- 新增导入
 import platform # <--- 新增导入
 import re
+import gc
+import ctypes
+import multiprocessing
+import asyncio
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 可选：安装了 uvicorn 时使用 ASGI 服务 (C 实现的 HTTP 解析 + 异步 I/O)，否则退回内置 http.server
+try:
+    import uvicorn
+    HAS_UVICORN = True
+except ImportError:
+    HAS_UVICORN = False
 
 # === 导入现有的 Reader 逻辑 ===
 # 请确保 reader.py 在同一目录下
@@ -31,6 +45,38 @@ TIMER_LOCK = threading.Lock()
 TIMEOUT_SECONDS = 300 
 # 全局 Server 引用，用于优雅关闭
 SERVER_INSTANCE = None 
+# 大 Tensor 统计用的进程池 (首次需要时在后台启动)，计算期间主进程仍可响应其它请求
+INSPECT_POOL = None
+# worker 已启动完毕 (spawn + import torch 约 1.5s)；就绪前大 Tensor 仍在当前进程内计算
+INSPECT_POOL_READY = False
+# RLock: 进程池预热的回调可能在持锁的提交线程中直接执行
+INSPECT_POOL_LOCK = threading.RLock()
+# 每个 worker 都要 import torch (常驻约 500MB)，只保留一个
+INSPECT_POOL_WORKERS = 1
+
+# === 归还内存给操作系统的系统调用，启动时绑定一次，/release 时直接调用 ===
+# Linux: malloc_trim(0)；Windows: 清空进程 WorkingSet；其它平台不处理
+_MALLOC_TRIM = None
+_EMPTY_WORKING_SET = None
+if platform.system() == 'Linux':
+    try:
+        _MALLOC_TRIM = ctypes.CDLL('libc.so.6').malloc_trim
+    except Exception:
+        pass
+elif platform.system() == 'Windows':
+    try:
+        _KERNEL32 = ctypes.windll.kernel32
+        # === 修复：显式定义参数类型，确保 64 位兼容 ===
+        # 定义参数类型：Handle (void*), Size (size_t), Size (size_t)
+        _KERNEL32.SetProcessWorkingSetSize.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t]
+        _KERNEL32.SetProcessWorkingSetSize.restype = ctypes.c_int
+        _KERNEL32.GetCurrentProcess.restype = ctypes.c_void_p
+        # 使用 c_size_t(-1) 来表示最大值 (即 0xFFFFFFFFFFFFFFFF)
+        _EMPTY_WORKING_SET = lambda: _KERNEL32.SetProcessWorkingSetSize(
+            _KERNEL32.GetCurrentProcess(), ctypes.c_size_t(-1), ctypes.c_size_t(-1)
+        )
+    except Exception as e:
+        print(f"[Server] Memory release unavailable: {e}", file=sys.stderr)
 
 def _normalize_file_path(file_path):
     if not file_path or not isinstance(file_path, str):
@@ -91,6 +137,113 @@ def _parse_display_path(display_path):
     return tokens
 
 
+def _inspect_worker_init():
+    """
+    worker 启动时执行：父进程退出后 worker 随之退出。
+    父进程被 SIGKILL / TerminateProcess 时来不及关闭进程池，否则 worker 会成为孤儿进程并一直占着内存
+    """
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        return
+    def watch_parent():
+        parent.join()
+        os._exit(0)
+    threading.Thread(target=watch_parent, daemon=True).start()
+
+def _mark_inspect_pool_ready(pool, future):
+    global INSPECT_POOL_READY
+    with INSPECT_POOL_LOCK:
+        if INSPECT_POOL is pool and not future.cancelled() and future.exception() is None:
+            INSPECT_POOL_READY = True
+
+def _get_inspect_pool():
+    """
+    返回已就绪的进程池。尚未创建时在后台启动并返回 None：
+    启动代价远大于单次统计，本次 (以及预热完成前的) 请求仍在当前进程内计算
+    """
+    global INSPECT_POOL, INSPECT_POOL_READY
+    with INSPECT_POOL_LOCK:
+        if INSPECT_POOL is None:
+            # spawn: 不 fork 已启动线程 / OpenMP 线程池的进程，避免子进程死锁
+            pool = INSPECT_POOL = ProcessPoolExecutor(
+                max_workers=INSPECT_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_inspect_worker_init,
+            )
+            INSPECT_POOL_READY = False
+            pool.submit(os.getpid).add_done_callback(lambda f: _mark_inspect_pool_ready(pool, f))
+            return None
+        return INSPECT_POOL if INSPECT_POOL_READY else None
+
+def _shutdown_inspect_pool(pool=None, wait=True):
+    """
+    关闭进程池 (/release 释放最后一个文件、超时退出、SIGTERM 时调用)，wait=True 时等待 worker 退出。
+    传入 pool 时只在它仍是当前进程池时才丢弃 (用于替换已损坏的进程池)
+    """
+    global INSPECT_POOL, INSPECT_POOL_READY
+    with INSPECT_POOL_LOCK:
+        if pool is None:
+            pool = INSPECT_POOL
+        if pool is None:
+            return
+        if INSPECT_POOL is pool:
+            INSPECT_POOL = None
+            INSPECT_POOL_READY = False
+    try:
+        pool.shutdown(wait=wait, cancel_futures=True)
+    except Exception:
+        pass
+
+def _inspect_tensor(r, key_json):
+    """大 safetensors Tensor 交给进程池计算，其余情况 (或进程池不可用时) 在当前进程内计算"""
+    flat_key = r.heavy_inspect_key(key_json) if isinstance(r, reader.SafetensorsReader) else None
+    if flat_key is None:
+        return r.get_tensor_data(key_json)
+    pool = _get_inspect_pool()
+    if pool is None:
+        return r.get_tensor_data(key_json)
+    try:
+        result = pool.submit(reader.inspect_safetensors_tensor, r.file_path, flat_key).result()
+    except BrokenProcessPool as e:
+        # worker 崩溃后进程池不能再用，丢弃它，下次请求时重新创建
+        print(f"[Server] Inspect worker crashed, recreating pool: {e}", file=sys.stderr)
+        _shutdown_inspect_pool(pool, wait=False)
+        return r.get_tensor_data(key_json)
+    except Exception as e:
+        print(f"[Server] Inspect worker failed, computing in-process: {e}", file=sys.stderr)
+        return r.get_tensor_data(key_json)
+    # 统计量回填到主进程的缓存，再次查看时直接命中
+    if isinstance(result, dict) and isinstance(result.get("stats"), dict):
+        with r.cache_lock:
+            r.stats_cache[flat_key] = dict(result["stats"])
+    return result
+
+def _get_or_reload_reader(file_path, allow_unsafe):
+    """
+    取出缓存的 Reader；不在内存中时 (服务器刚重启，或者被释放了) 自动重载。
+    返回 (reader, reloaded_from_disk, error)
+    """
+    # 1. 检查是否在内存中
+    r = LOADED_MODELS.get(file_path)
+    if r is not None:
+        return r, False, None
+
+    # 2. 如果不在内存中，尝试自动重载
+    try:
+        print(f"[Server] Model not found in cache, auto-reloading: {file_path}", file=sys.stderr)
+        # 复用 ReaderFactory 创建实例
+        r = reader.ReaderFactory.get_reader(file_path)
+        if hasattr(r, "set_allow_unsafe"):
+            r.set_allow_unsafe(allow_unsafe)
+        # 仅重载到内存，不触发结构导出
+        r.load()
+        # 存入全局缓存
+        LOADED_MODELS[file_path] = r
+        return r, True, None
+    except Exception as e:
+        # 重载失败，这才是真正的错误
+        return None, True, f"Model not loaded and auto-reload failed: {str(e)}"
+
 def _resolve_node_by_path(root, display_path):
     tokens = _parse_display_path(display_path)
     node = root
@@ -224,11 +377,18 @@ def auto_shutdown():
     # 1. 尝试优雅关闭 Server Loop (让 serve_forever 返回)
     if SERVER_INSTANCE:
         try:
-            # shutdown() 必须在非主线程调用，这里正好是 Timer 线程，所以是安全的
-            SERVER_INSTANCE.shutdown()
+            if HAS_UVICORN and isinstance(SERVER_INSTANCE, uvicorn.Server):
+                # uvicorn 在主循环中检查该标志后退出
+                SERVER_INSTANCE.should_exit = True
+            else:
+                # shutdown() 必须在非主线程调用，这里正好是 Timer 线程，所以是安全的
+                SERVER_INSTANCE.shutdown()
         except:
             pass
 
+    # 先关闭 inspect 进程池并等 worker 退出，下面的 SIGKILL 不会替我们清理子进程
+    _shutdown_inspect_pool()
+
     # 2. 根据系统执行强制退出
     system_platform = platform.system()
     
@@ -243,110 +403,106 @@ def auto_shutdown():
         # Windows
         os._exit(0)
 
-class RequestHandler(http.server.BaseHTTPRequestHandler):
-    def do_POST(self):
-        # 收到请求，重置倒计时
-        reset_shutdown_timer()
-        
-        # 1. 解析请求路径和 Body
-        parsed_path = urllib.parse.urlparse(self.path)
-        content_length = int(self.headers['Content-Length'])
-        body = self.rfile.read(content_length)
-        
-        try:
-            payload = json.loads(body)
-        except json.JSONDecodeError:
-            self.send_response(400)
-            self.end_headers()
-            return
+def handle_request(path, payload):
+    """
+    按路径分发一个已解析的 JSON 请求，返回 (状态码, 响应 bytes)。
+    内置 http.server 与 ASGI 两种前端共用这一份逻辑
+    """
+    response_data = {"error": "Unknown command"}
+    # 已序列化好的响应体 (命中缓存时)，为 None 时序列化 response_data
+    response_bytes = None
+    status_code = 200
 
-        response_data = {"error": "Unknown command"}
-        status_code = 200
-
-        try:
-            # === API: /load (加载或获取结构) ===
-            if parsed_path.path == '/load':
-                file_path = _normalize_file_path(payload.get('file_path'))
-                force_local = payload.get('force_local', False)
-                allow_unsafe = payload.get('allow_unsafe', False)
-                cache_dir = payload.get('cache_dir')
-                cache_key = payload.get('cache_key')
-                if not file_path:
-                    response_data = {"error": "Missing file_path"}
-                    self._send_json(response_data, status_code)
-                    return
+    try:
+        # === API: /load (加载或获取结构) ===
+        if path == '/load':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            force_local = payload.get('force_local', False)
+            allow_unsafe = payload.get('allow_unsafe', False)
+            cache_dir = payload.get('cache_dir')
+            cache_key = payload.get('cache_key')
+            if not file_path:
+                response_data = {"error": "Missing file_path"}
+                return status_code, reader.dumps_json_bytes(response_data)
+            
+            # 如果已经在内存里，直接用；否则新建
+            if file_path not in LOADED_MODELS:
+                # 使用 ReaderFactory (需要修改 reader.py 暴露它，或者直接实例化)
+                # 假设 reader.py 里有 ReaderFactory
+                r = reader.ReaderFactory.get_reader(file_path)
+                if hasattr(r, "set_allow_unsafe"):
+                    r.set_allow_unsafe(allow_unsafe)
+                if hasattr(r, "set_export_cache_dir"):
+                    r.set_export_cache_dir(cache_dir)
+                if hasattr(r, "set_export_cache_key"):
+                    r.set_export_cache_key(cache_key)
                 
-                # 如果已经在内存里，直接用；否则新建
-                if file_path not in LOADED_MODELS:
-                    # 使用 ReaderFactory (需要修改 reader.py 暴露它，或者直接实例化)
-                    # 假设 reader.py 里有 ReaderFactory
-                    r = reader.ReaderFactory.get_reader(file_path)
-                    if hasattr(r, "set_allow_unsafe"):
-                        r.set_allow_unsafe(allow_unsafe)
-                    if hasattr(r, "set_export_cache_dir"):
-                        r.set_export_cache_dir(cache_dir)
-                    if hasattr(r, "set_export_cache_key"):
-                        r.set_export_cache_key(cache_key)
-                    
-                    # 首次加载到内存：允许导出 full json/sqlite
-                    if isinstance(r, reader.TorchReader):
-                        structure = r.get_structure(export_full_artifacts=True)
-                    else:
-                        structure = r.get_structure()
-                    
-                    # 存入缓存
-                    LOADED_MODELS[file_path] = r
-                    
-                    # 检查是否有全局索引 (这里复用 reader.py 的逻辑)
-                    # 简单起见，我们假设 reader.get_structure() 返回的就是标准结构
-                    response_data = {"is_global": False, "data": structure}
-                    response_data["source_file_path"] = file_path
-                    full_json_path = None
-                    full_index_path = None
-                    export_error = None
-                    if hasattr(r, "get_last_structure_meta"):
-                        structure_meta = r.get_last_structure_meta()
-                        if structure_meta.get("truncated"):
-                            response_data["truncated"] = True
-                        full_json_path = structure_meta.get("full_structure_path")
-                        full_index_path = structure_meta.get("full_structure_index_path")
-                        if structure_meta.get("full_structure_export_error"):
-                            export_error = structure_meta.get("full_structure_export_error")
-                    full_json_path, full_index_path, fallback_err = _ensure_structure_export_if_missing(
-                        file_path, structure, cache_dir, cache_key, full_json_path, full_index_path
-                    )
-                    if fallback_err:
-                        export_error = fallback_err
-                    response_data["full_structure_path"] = full_json_path
-                    response_data["full_structure_index_path"] = full_index_path
-                    if export_error:
-                        response_data["full_structure_export_error"] = export_error
-                    
-                    # 尝试检测全局索引 (复用 reader.py 的逻辑片段)
-                    if not force_local and not isinstance(r, reader.JaxReader):
-                        dir_name = os.path.dirname(file_path)
-                        base_name = os.path.basename(file_path)
-                        possible = ["model.safetensors.index.json", "pytorch_model.bin.index.json", base_name + ".index.json"]
-                        for idx in possible:
-                            if os.path.exists(os.path.join(dir_name, idx)):
-                                idx_res = reader.read_global_index(os.path.join(dir_name, idx), base_name)
-                                idx_res["full_structure_path"] = full_json_path
-                                idx_res["full_structure_index_path"] = full_index_path
-                                idx_res["source_file_path"] = file_path
-                                if export_error:
-                                    idx_res["full_structure_export_error"] = export_error
-                                response_data = idx_res
-                                break
+                # 首次加载到内存：允许导出 full json/sqlite
+                if isinstance(r, reader.TorchReader):
+                    structure = r.get_structure(export_full_artifacts=True)
+                else:
+                    structure = r.get_structure()
+                
+                # 存入缓存
+                LOADED_MODELS[file_path] = r
+                
+                # 检查是否有全局索引 (这里复用 reader.py 的逻辑)
+                # 简单起见，我们假设 reader.get_structure() 返回的就是标准结构
+                response_data = {"is_global": False, "data": structure}
+                response_data["source_file_path"] = file_path
+                full_json_path = None
+                full_index_path = None
+                export_error = None
+                if hasattr(r, "get_last_structure_meta"):
+                    structure_meta = r.get_last_structure_meta()
+                    if structure_meta.get("truncated"):
+                        response_data["truncated"] = True
+                    full_json_path = structure_meta.get("full_structure_path")
+                    full_index_path = structure_meta.get("full_structure_index_path")
+                    if structure_meta.get("full_structure_export_error"):
+                        export_error = structure_meta.get("full_structure_export_error")
+                full_json_path, full_index_path, fallback_err = _ensure_structure_export_if_missing(
+                    file_path, structure, cache_dir, cache_key, full_json_path, full_index_path
+                )
+                if fallback_err:
+                    export_error = fallback_err
+                response_data["full_structure_path"] = full_json_path
+                response_data["full_structure_index_path"] = full_index_path
+                if export_error:
+                    response_data["full_structure_export_error"] = export_error
+                
+                # 尝试检测全局索引 (复用 reader.py 的逻辑片段)
+                if not force_local and not isinstance(r, reader.JaxReader):
+                    dir_name = os.path.dirname(file_path)
+                    base_name = os.path.basename(file_path)
+                    possible = ["model.safetensors.index.json", "pytorch_model.bin.index.json", base_name + ".index.json"]
+                    for idx in possible:
+                        if os.path.exists(os.path.join(dir_name, idx)):
+                            idx_res = reader.read_global_index(os.path.join(dir_name, idx), base_name)
+                            idx_res["full_structure_path"] = full_json_path
+                            idx_res["full_structure_index_path"] = full_index_path
+                            idx_res["source_file_path"] = file_path
+                            if export_error:
+                                idx_res["full_structure_export_error"] = export_error
+                            response_data = idx_res
+                            break
+            else:
+                # 已存在缓存中，直接获取结构
+                # 注意：如果是大模型，get_structure 应该是极快的（因为 content 已在内存）
+                r = LOADED_MODELS[file_path]
+                if hasattr(r, "set_allow_unsafe"):
+                    r.set_allow_unsafe(allow_unsafe)
+                if hasattr(r, "set_export_cache_dir"):
+                    r.set_export_cache_dir(cache_dir)
+                if hasattr(r, "set_export_cache_key"):
+                    r.set_export_cache_key(cache_key)
+                # 参数相同的重复 /load 直接返回上次序列化好的响应，跳过结构遍历和 JSON 序列化
+                response_sig = (bool(allow_unsafe), cache_dir, cache_key)
+                with r.cache_lock:
+                    cached_response = r.load_response_cache
+                if cached_response is not None and cached_response[0] == response_sig:
+                    response_bytes = cached_response[1]
                 else:
-                    # 已存在缓存中，直接获取结构
-                    # 注意：如果是大模型，get_structure 应该是极快的（因为 content 已在内存）
-                    r = LOADED_MODELS[file_path]
-                    if hasattr(r, "set_allow_unsafe"):
-                        r.set_allow_unsafe(allow_unsafe)
-                    if hasattr(r, "set_export_cache_dir"):
-                        r.set_export_cache_dir(cache_dir)
-                    if hasattr(r, "set_export_cache_key"):
-                        r.set_export_cache_key(cache_key)
                     # 非首次加载：只读内存结构，不再写 full json/sqlite
                     if isinstance(r, reader.TorchReader):
                         structure = r.get_structure(export_full_artifacts=False)
@@ -369,188 +525,292 @@ class RequestHandler(http.server.BaseHTTPRequestHandler):
                     response_data["full_structure_index_path"] = full_index_path
                     if export_error:
                         response_data["full_structure_export_error"] = export_error
-
-            elif parsed_path.path == '/tree_children':
-                index_db_path = payload.get('index_db_path')
-                node_id = int(payload.get('node_id', 1))
-                offset = int(payload.get('offset', 0))
-                limit = int(payload.get('limit', 200))
-                response_data = large_structure_index.get_children(index_db_path, node_id, offset, limit)
-
-            elif parsed_path.path == '/tree_search':
-                index_db_path = payload.get('index_db_path')
-                query = payload.get('query', '')
-                limit = int(payload.get('limit', 50))
-                response_data = large_structure_index.search_nodes(index_db_path, query, limit)
-
-            elif parsed_path.path == '/tree_children_by_path':
-                index_db_path = payload.get('index_db_path')
-                display_path = payload.get('display_path', '$')
-                offset = int(payload.get('offset', 0))
-                limit = int(payload.get('limit', 200))
-                response_data = large_structure_index.get_children_by_path(index_db_path, display_path, offset, limit)
-
-            elif parsed_path.path == '/model_status':
-                file_path = _normalize_file_path(payload.get('file_path'))
-                response_data = {
-                    "loaded_in_memory": bool(file_path and file_path in LOADED_MODELS)
-                }
-
-            elif parsed_path.path == '/tree_children_dynamic':
-                file_path = _normalize_file_path(payload.get('file_path'))
-                display_path = payload.get('display_path', '$')
-                offset = int(payload.get('offset', 0))
-                limit = int(payload.get('limit', 200))
-                allow_unsafe = payload.get('allow_unsafe', False)
-                if not file_path:
-                    response_data = {"error": "Missing file_path in dynamic tree request"}
-                    self._send_json(response_data, status_code)
-                    return
-                reloaded_from_disk = False
-                r = LOADED_MODELS.get(file_path)
-                if r is None:
-                    reloaded_from_disk = True
-                    r = reader.ReaderFactory.get_reader(file_path)
-                    if hasattr(r, "set_allow_unsafe"):
-                        r.set_allow_unsafe(allow_unsafe)
+                    response_bytes = reader.dumps_json_bytes(response_data)
+                    # 结构读取失败时不缓存，下次 /load 重新尝试
+                    if not (isinstance(structure, dict) and "error" in structure):
+                        with r.cache_lock:
+                            r.load_response_cache = (response_sig, response_bytes)
+
+        elif path == '/tree_children':
+            index_db_path = payload.get('index_db_path')
+            node_id = int(payload.get('node_id', 1))
+            offset = int(payload.get('offset', 0))
+            limit = int(payload.get('limit', 200))
+            response_data = large_structure_index.get_children(index_db_path, node_id, offset, limit)
+
+        elif path == '/tree_search':
+            index_db_path = payload.get('index_db_path')
+            query = payload.get('query', '')
+            limit = int(payload.get('limit', 50))
+            response_data = large_structure_index.search_nodes(index_db_path, query, limit)
+
+        elif path == '/tree_children_by_path':
+            index_db_path = payload.get('index_db_path')
+            display_path = payload.get('display_path', '$')
+            offset = int(payload.get('offset', 0))
+            limit = int(payload.get('limit', 200))
+            response_data = large_structure_index.get_children_by_path(index_db_path, display_path, offset, limit)
+
+        elif path == '/model_status':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            response_data = {
+                "loaded_in_memory": bool(file_path and file_path in LOADED_MODELS)
+            }
+
+        elif path == '/tree_children_dynamic':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            display_path = payload.get('display_path', '$')
+            offset = int(payload.get('offset', 0))
+            limit = int(payload.get('limit', 200))
+            allow_unsafe = payload.get('allow_unsafe', False)
+            if not file_path:
+                response_data = {"error": "Missing file_path in dynamic tree request"}
+                return status_code, reader.dumps_json_bytes(response_data)
+            reloaded_from_disk = False
+            r = LOADED_MODELS.get(file_path)
+            if r is None:
+                reloaded_from_disk = True
+                r = reader.ReaderFactory.get_reader(file_path)
+                if hasattr(r, "set_allow_unsafe"):
+                    r.set_allow_unsafe(allow_unsafe)
+                try:
+                    # JaxReader.load 只读元数据，动态展开需要完整内容
+                    getattr(r, "load_full", r.load)()
+                except Exception as e:
+                    response_data = {"error": str(e), "reloaded_from_disk": True}
+                    return status_code, reader.dumps_json_bytes(response_data)
+                LOADED_MODELS[file_path] = r
+            else:
+                if hasattr(r, "set_allow_unsafe"):
+                    r.set_allow_unsafe(allow_unsafe)
+                # 结构视图可能只做了轻量解析，动态展开需要完整内容
+                if getattr(r, 'content', None) is None:
                     try:
-                        r.load()
+                        getattr(r, "load_full", r.load)()
                     except Exception as e:
-                        response_data = {"error": str(e), "reloaded_from_disk": True}
-                        self._send_json(response_data, status_code)
-                        return
-                    LOADED_MODELS[file_path] = r
+                        response_data = {"error": str(e), "reloaded_from_disk": False}
+                        return status_code, reader.dumps_json_bytes(response_data)
+            root_obj = getattr(r, 'content', None)
+            if root_obj is None:
+                response_data = {"error": f"Model content is empty: {file_path}", "reloaded_from_disk": reloaded_from_disk}
+            else:
+                target = _resolve_node_by_path(root_obj, display_path)
+                if target is None:
+                    response_data = {"error": f"Path not found: {display_path}", "reloaded_from_disk": reloaded_from_disk}
                 else:
+                    response_data = _dynamic_children(target, display_path, offset, limit)
+                    response_data["reloaded_from_disk"] = reloaded_from_disk
+
+        elif path == '/tree_node':
+            index_db_path = payload.get('index_db_path')
+            node_id = int(payload.get('node_id', 1))
+            response_data = large_structure_index.get_node(index_db_path, node_id)
+
+        # === API: /inspect (查看数据) ===
+        elif path == '/inspect':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            key_json = payload.get('key') # String format of JSON list
+            allow_unsafe = payload.get('allow_unsafe', False)
+            if not file_path:
+                response_data = {"error": "Missing file_path"}
+                return status_code, reader.dumps_json_bytes(response_data)
+            
+            r, reloaded_from_disk, reload_error = _get_or_reload_reader(file_path, allow_unsafe)
+            if reload_error:
+                response_data = {"error": reload_error, "reloaded_from_disk": True}
+            
+            # 3. 如果成功获取到了 Reader (无论是缓存的还是重载的)，执行查询
+            if r is not None:
+                try:
                     if hasattr(r, "set_allow_unsafe"):
                         r.set_allow_unsafe(allow_unsafe)
-                root_obj = getattr(r, 'content', None)
-                if root_obj is None:
-                    response_data = {"error": f"Model content is empty: {file_path}", "reloaded_from_disk": reloaded_from_disk}
-                else:
-                    target = _resolve_node_by_path(root_obj, display_path)
-                    if target is None:
-                        response_data = {"error": f"Path not found: {display_path}", "reloaded_from_disk": reloaded_from_disk}
-                    else:
-                        response_data = _dynamic_children(target, display_path, offset, limit)
+                    response_data = _inspect_tensor(r, key_json)
+                    if isinstance(response_data, dict):
                         response_data["reloaded_from_disk"] = reloaded_from_disk
-
-            elif parsed_path.path == '/tree_node':
-                index_db_path = payload.get('index_db_path')
-                node_id = int(payload.get('node_id', 1))
-                response_data = large_structure_index.get_node(index_db_path, node_id)
-
-            # === API: /inspect (查看数据) ===
-            elif parsed_path.path == '/inspect':
-                file_path = _normalize_file_path(payload.get('file_path'))
-                key_json = payload.get('key') # String format of JSON list
-                allow_unsafe = payload.get('allow_unsafe', False)
-                reloaded_from_disk = False
-                if not file_path:
-                    response_data = {"error": "Missing file_path"}
-                    self._send_json(response_data, status_code)
-                    return
-                
-                # 1. 检查是否在内存中
-                r = LOADED_MODELS.get(file_path)
+                except Exception as e:
+                    response_data = {"error": f"Inspect failed: {str(e)}", "reloaded_from_disk": reloaded_from_disk}
+
+        # === API: /inspect_batch (批量查看数据，一次请求返回多个 Tensor 的统计) ===
+        elif path == '/inspect_batch':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            keys = payload.get('keys')
+            allow_unsafe = payload.get('allow_unsafe', False)
+            if not file_path:
+                response_data = {"error": "Missing file_path"}
+            elif not isinstance(keys, list):
+                response_data = {"error": "Missing keys (list of key paths)"}
+            else:
+                r, reloaded_from_disk, reload_error = _get_or_reload_reader(file_path, allow_unsafe)
+                if reload_error:
+                    response_data = {"error": reload_error, "reloaded_from_disk": True}
+                else:
+                    if hasattr(r, "set_allow_unsafe"):
+                        r.set_allow_unsafe(allow_unsafe)
+                    # 每个 key 可以是 JSON 字符串 (与 /inspect 相同) 或直接是列表
+                    key_jsons = [k if isinstance(k, str) else json.dumps(k, ensure_ascii=False) for k in keys]
+                    response_data = {
+                        "results": r.get_tensor_data_batch(key_jsons),
+                        "reloaded_from_disk": reloaded_from_disk,
+                    }
+
+        # === API: /release (释放内存) ===
+        elif path == '/release':
+            file_path = _normalize_file_path(payload.get('file_path'))
+            if file_path in LOADED_MODELS:
+                r = LOADED_MODELS.pop(file_path)
+                # 主动释放 Reader 持有的句柄 / mmap，不依赖引用计数
+                r.close()
+                del r
+                # worker 常驻数百 MB：最后一个文件释放后关闭，下次需要时再后台启动。
+                # 不等待 worker 退出，正在其他线程中进行的统计不会阻塞本次请求
+                if not LOADED_MODELS:
+                    _shutdown_inspect_pool(wait=False)
+                # 1. Python 层垃圾回收
+                gc.collect()
                 
-                # 2. 如果不在内存中（可能服务器刚重启，或者被释放了），尝试自动重载
-                if r is None:
+                # 2. 强制归还内存给操作系统 (OS 层面)
+                if _MALLOC_TRIM is not None:
                     try:
-                        print(f"[Server] Model not found in cache, auto-reloading: {file_path}", file=sys.stderr)
-                        # 复用 ReaderFactory 创建实例
-                        r = reader.ReaderFactory.get_reader(file_path)
-                        if hasattr(r, "set_allow_unsafe"):
-                            r.set_allow_unsafe(allow_unsafe)
-                        # 仅重载到内存，不触发结构导出
-                        r.load()
-                        # 存入全局缓存
-                        LOADED_MODELS[file_path] = r
-                        reloaded_from_disk = True
-                    except Exception as e:
-                        # 重载失败，这才是真正的错误
-                        response_data = {"error": f"Model not loaded and auto-reload failed: {str(e)}", "reloaded_from_disk": True}
-                        r = None # 确保后面不会执行
-                
-                # 3. 如果成功获取到了 Reader (无论是缓存的还是重载的)，执行查询
-                if r is not None:
+                        # Linux: 使用 malloc_trim 强制归还堆内存
+                        _MALLOC_TRIM(0)
+                    except:
+                        pass
+                elif _EMPTY_WORKING_SET is not None:
                     try:
-                        if hasattr(r, "set_allow_unsafe"):
-                            r.set_allow_unsafe(allow_unsafe)
-                        response_data = r.get_tensor_data(key_json)
-                        if isinstance(response_data, dict):
-                            response_data["reloaded_from_disk"] = reloaded_from_disk
+                        if _EMPTY_WORKING_SET() == 0:
+                            print(f"[Server] Memory release warning: {ctypes.WinError()}", file=sys.stderr)
+                        else:
+                            print("[Server] Windows WorkingSet emptied.", file=sys.stderr)
                     except Exception as e:
-                        response_data = {"error": f"Inspect failed: {str(e)}", "reloaded_from_disk": reloaded_from_disk}
-
-            # === API: /release (释放内存) ===
-            elif parsed_path.path == '/release':
-                file_path = _normalize_file_path(payload.get('file_path'))
-                if file_path in LOADED_MODELS:
-                    del LOADED_MODELS[file_path]
-                    # 1. Python 层垃圾回收
-                    import gc
-                    gc.collect()
-                    
-                    # 2. 强制归还内存给操作系统 (OS 层面)
-                    import ctypes
-                    import platform
-                    system_platform = platform.system()
-                    
-
-                    if system_platform == 'Linux':
-                        try:
-                            # Linux: 使用 malloc_trim 强制归还堆内存
-                            ctypes.CDLL('libc.so.6').malloc_trim(0)
-                        except:
-                            pass
-                            
-                    elif system_platform == 'Windows':
-                        try:
-                            # === 修复：显式定义参数类型，确保 64 位兼容 ===
-                            kernel32 = ctypes.windll.kernel32
-                            
-                            # 定义参数类型：Handle (void*), Size (size_t), Size (size_t)
-                            kernel32.SetProcessWorkingSetSize.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t]
-                            kernel32.SetProcessWorkingSetSize.restype = ctypes.c_int
-                            
-                            # 获取当前进程句柄
-                            proc = kernel32.GetCurrentProcess()
-                            
-                            # 调用 API：使用 c_size_t(-1) 来表示最大值 (即 0xFFFFFFFFFFFFFFFF)
-                            is_success = kernel32.SetProcessWorkingSetSize(proc, ctypes.c_size_t(-1), ctypes.c_size_t(-1))
-                            
-                            if is_success == 0:
-                                print(f"[Server] Memory release warning: {ctypes.WinError()}", file=sys.stderr)
-                            else:
-                                print("[Server] Windows WorkingSet emptied.", file=sys.stderr)
-
-                        except Exception as e:
-                            # 打印错误而不是 pass，方便排查
-                            print(f"[Server] Failed to release memory: {e}", file=sys.stderr)
-                    
-                    response_data = {"status": "released"}
-                else:
-                    response_data = {"status": "not_found"}
-
+                        # 打印错误而不是 pass，方便排查
+                        print(f"[Server] Failed to release memory: {e}", file=sys.stderr)
+                
+                response_data = {"status": "released"}
             else:
-                status_code = 404
+                response_data = {"status": "not_found"}
+
+        else:
+            status_code = 404
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        response_data = {"error": str(e)}
+        response_bytes = None
+
+    # orjson 可用时直接得到 UTF-8 bytes，大结构树的序列化快数倍
+    if response_bytes is None:
+        response_bytes = reader.dumps_json_bytes(response_data)
+    return status_code, response_bytes
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    # HTTP/1.1 保持连接：UI 连续点击产生的大量小请求复用同一个 TCP 连接，
+    # 每个响应都必须带 Content-Length
+    protocol_version = "HTTP/1.1"
+    # header 和 body 分两次 send()，保持连接时 Nagle + 延迟 ACK 会让每个请求多等约 40ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        # 收到请求，重置倒计时
+        reset_shutdown_timer()
+        
+        # 1. 解析请求路径和 Body
+        parsed_path = urllib.parse.urlparse(self.path)
+        content_length = int(self.headers['Content-Length'])
+        body = self.rfile.read(content_length)
+        
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
 
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            response_data = {"error": str(e)}
+        status_code, response_bytes = handle_request(parsed_path.path, payload)
 
         # 发送响应
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response_bytes)))
         self.end_headers()
-        self.wfile.write(json.dumps(response_data, ensure_ascii=False).encode('utf-8'))
+        self.wfile.write(response_bytes)
 
     def log_message(self, format, *args):
         # 屏蔽默认的 HTTP 日志，保持 stdout 干净
         pass
 
+async def asgi_app(scope, receive, send):
+    """
+    与 RequestHandler 等价的 ASGI 入口 (uvicorn 可用时使用)。
+    路由逻辑是同步的，放到线程池里执行，事件循环只负责收发
+    """
+    if scope["type"] != "http":
+        return
+
+    # 收到请求，重置倒计时
+    reset_shutdown_timer()
+
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+    if scope["method"] != "POST":
+        # 与 BaseHTTPRequestHandler 一致：未实现的方法返回 501
+        status_code, response_bytes = 501, b""
+    else:
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            payload = None
+        if payload is None:
+            status_code, response_bytes = 400, b""
+        else:
+            loop = asyncio.get_running_loop()
+            status_code, response_bytes = await loop.run_in_executor(None, handle_request, scope["path"], payload)
+
+    headers = [(b"content-length", str(len(response_bytes)).encode("ascii"))]
+    if response_bytes:
+        headers.append((b"content-type", b"application/json"))
+    await send({"type": "http.response.start", "status": status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response_bytes})
+
+def _serve_uvicorn():
+    """uvicorn 在自己绑定的随机端口上运行，端口号提前打印给 VS Code"""
+    global SERVER_INSTANCE
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    # 先 listen：打印端口后客户端立即连接，事件循环启动前的连接在 backlog 中排队
+    sock.listen(128)
+    config = uvicorn.Config(asgi_app, log_config=None, log_level="warning", access_log=False, lifespan="off")
+    server = uvicorn.Server(config)
+    SERVER_INSTANCE = server
+
+    print(f"SERVER_STARTED:{sock.getsockname()[1]}")
+    sys.stdout.flush()
+
+    reset_shutdown_timer()
+    try:
+        # uvicorn 自己处理 SIGTERM / SIGINT，优雅退出后 run() 返回
+        server.run(sockets=[sock])
+    finally:
+        _shutdown_inspect_pool()
+
+def _handle_sigterm(signum, frame):
+    # VS Code 端 serverProcess.kill() 发送 SIGTERM：转成 SystemExit，让 serve_forever 退出并走清理逻辑
+    raise SystemExit(0)
+
 if __name__ == "__main__":
+    if HAS_UVICORN:
+        try:
+            _serve_uvicorn()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
     # 使用 ThreadingHTTPServer 支持并发 (虽然 JS 端是串行的，但防卡死)
     # Python 3.7+ 支持 ThreadingHTTPServer
     server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
@@ -566,8 +826,11 @@ if __name__ == "__main__":
     sys.stdout.flush()
     
     reset_shutdown_timer()
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     
     try:
         server.serve_forever()
-    except KeyboardInterrupt:
-        pass
\ No newline at end of file
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        _shutdown_inspect_pool()
\ No newline at end of file
@@ -0,0 +1,621 @@
+"""
+reader.py 的冒烟测试，测试数据都在临时目录中生成。
+运行: python -m unittest discover -s python_scripts/tests
+"""
+import collections.abc
+import gc
+import io
+import json
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import types
+import unittest
+import warnings
+import zipfile
+from unittest import mock
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import reader  # noqa: E402
+
+_ST_DTYPES = {torch.float32: "F32", torch.int64: "I64", torch.uint8: "U8"}
+
+
+def write_safetensors(path, tensors):
+    """
+    不依赖 safetensors 库，按文件格式直接写出 (8 字节 header 长度 + JSON header + 数据)。
+    Tensor 按传入顺序首尾相接，header 用空格补齐到 8 字节对齐
+    """
+    header, chunks, offset = {}, [], 0
+    for name, t in tensors.items():
+        data = t.contiguous().numpy().tobytes()
+        header[name] = {"dtype": _ST_DTYPES[t.dtype], "shape": list(t.shape), "data_offsets": [offset, offset + len(data)]}
+        chunks.append(data)
+        offset += len(data)
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        f.writelines(chunks)
+
+
+def iter_leaves(node, path=()):
+    """按结构摘要中的出现顺序产出 (_idx, key 路径)"""
+    if isinstance(node, dict):
+        if node.get("_type") == "tensor":
+            yield node.get("_idx"), list(path)
+            return
+        for k, v in node.items():
+            yield from iter_leaves(v, path + (str(k),))
+    elif isinstance(node, list):
+        for i, v in enumerate(node):
+            yield from iter_leaves(v, path + (str(i),))
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class SafetensorsMapTest(TempDirTestCase):
+    def open_reader(self, tensors):
+        path = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(path, tensors)
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        return r
+
+    def assert_stats(self, result, tensor):
+        self.assertNotIn("error", result)
+        stats = result["stats"]
+        self.assertEqual(stats["shape"], list(tensor.shape))
+        self.assertAlmostEqual(stats["min"], tensor.min().item(), places=5)
+        self.assertAlmostEqual(stats["max"], tensor.max().item(), places=5)
+
+    def test_mmap_path_is_taken(self):
+        w = torch.rand(8, 8)
+        r = self.open_reader({"a.w": w, "a.b": torch.arange(4, dtype=torch.uint8)})
+        # 映射路径不经过 safe_open
+        with mock.patch.object(reader, "safe_open", create=True, side_effect=AssertionError("safe_open called")):
+            result = r.get_tensor_data(json.dumps(["a", "w"]))
+        self.assertIsInstance(r.content, mmap.mmap)
+        self.assertIsNotNone(r.tensor_table)
+        self.assert_stats(result, w)
+        # 只读映射 (不按文件大小占用 commit 内存)
+        with self.assertRaises(TypeError):
+            r.content[0:1] = b"x"
+
+    def test_structure_reuses_header_entries(self):
+        r = self.open_reader({"a.w": torch.rand(2, 3), "a.b": torch.rand(3)})
+        structure = r.get_structure()
+        leaf = structure["a"]["w"]
+        self.assertEqual(leaf, {"dtype": "F32", "shape": [2, 3], "_type": "tensor", "location": "Current File", "_idx": 1})
+        # 叶子节点就是 JSON 解析得到的文件头条目，映射文件后同一个对象也是 tensor_table 的条目
+        self.assertIs(leaf, r._header[0]["a.w"])
+        r.load()
+        self.assertIs(r.tensor_table["a.w"], leaf)
+        self.assertEqual(r.tensor_offsets["a.w"], [0, 24])
+
+    def test_readonly_buffer_warning_is_suppressed(self):
+        # unittest 会改写 warnings 过滤器，在独立进程中按 server 的启动方式检查 (-W error 下不能有警告)
+        r = self.open_reader({"w": torch.rand(4)})
+        code = (
+            "import sys, json; sys.path.insert(0, sys.argv[1]); import reader; "
+            "r = reader.SafetensorsReader(sys.argv[2]); res = r.get_tensor_data(json.dumps(['w'])); "
+            "assert 'error' not in res, res"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-W", "error", "-c", code, os.path.dirname(reader.__file__), r.file_path],
+            capture_output=True, text=True,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+
+    def test_unaligned_offsets(self):
+        # 1 字节的 U8 之后，F32 数据的起始偏移不是 4 的倍数
+        w = torch.rand(5, 3)
+        r = self.open_reader({"pad": torch.ones(1, dtype=torch.uint8), "w": w})
+        result = r.get_tensor_data(json.dumps(["w"]))
+        self.assertEqual((r.data_base + r.tensor_offsets["w"][0]) % 4, 1)
+        self.assert_stats(result, w)
+
+
+class LazyStructureTest(TempDirTestCase):
+    def write_archive(self, pickle_bytes):
+        """构造只含 data.pkl 的 zip checkpoint"""
+        path = os.path.join(self.tmp, "crafted.pth")
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("archive/data.pkl", pickle_bytes)
+        return path
+
+    def test_state_dict_is_parsed_without_torch_load(self):
+        path = os.path.join(self.tmp, "ckpt.pth")
+        data = {"w": torch.ones(2, 3), "nested": {"b": torch.zeros(4, dtype=torch.bfloat16)}, "step": 7}
+        if hasattr(torch, "float8_e4m3fn"):
+            # float8 / uint16 等由 _rebuild_tensor_v3 重建
+            data["f8"] = torch.zeros(2, dtype=torch.float8_e4m3fn)
+        torch.save(data, path)
+
+        r = reader.TorchReader(path)
+        with mock.patch.object(reader.torch, "load", side_effect=AssertionError("torch.load called")):
+            structure = r.get_structure(export_full_artifacts=False)
+        self.assertEqual(structure["w"]["shape"], [2, 3])
+        self.assertEqual(structure["nested"]["b"]["dtype"], "bfloat16")
+        self.assertEqual(structure["step"], 7)
+        if "f8" in data:
+            self.assertEqual(structure["f8"]["dtype"], "float8_e4m3fn")
+
+    def test_module_falls_back_to_full_unpickler(self):
+        path = os.path.join(self.tmp, "module.pt")
+        torch.save(torch.nn.Linear(3, 2), path)
+        # 白名单之外的全局对象 (nn.Module) 由轻量解析拒绝
+        with self.assertRaises(pickle.UnpicklingError):
+            reader.load_structure_lazily(path)
+
+        r = reader.TorchReader(path)
+        r.set_allow_unsafe(True)
+        structure = r.get_structure(export_full_artifacts=False)
+        self.assertEqual(structure["weight"]["shape"], [2, 3])
+        self.assertEqual(structure["bias"]["shape"], [2])
+
+    def test_crafted_pickle_cannot_construct_real_tensors(self):
+        # GLOBAL torch.FloatStorage + REDUCE (2**40,)：真实构造函数会分配 4 TiB
+        path = self.write_archive(b"\x80\x02ctorch\nFloatStorage\n\x8a\x06\x00\x00\x00\x00\x00\x01\x85R.")
+        with self.assertRaises(TypeError):
+            reader.load_structure_lazily(path)
+        # GLOBAL torch._tensor.Tensor + REDUCE (3, 4)：只得到占位对象
+        path = self.write_archive(b"\x80\x02ctorch._tensor\nTensor\nK\x03K\x04\x86R.")
+        self.assertIsInstance(reader.load_structure_lazily(path), reader._TensorStub)
+
+
+class FlatKeyTreeTest(unittest.TestCase):
+    def build_one_by_one(self, items):
+        tree = {}
+        for flat_key, info in items:
+            reader.insert_into_tree(tree, flat_key.split('.'), info)
+        return tree
+
+    def test_matches_insert_into_tree(self):
+        keys = [
+            "model.layers.0.attn.q.weight", "model.layers.0.attn.q.bias", "model.layers.0.mlp.weight",
+            "model.layers.1.attn.q.weight", "model.layers.10.mlp.weight", "model.embed", "lm_head", "x.y.z",
+        ]
+        orders = [keys, sorted(keys), list(reversed(keys))]
+        for order in orders:
+            items = [(k, {"shape": [i]}) for i, k in enumerate(order)]
+            self.assertEqual(reader.build_tree_from_flat_keys(items), self.build_one_by_one(items))
+        tree = reader.build_tree_from_flat_keys([(k, i) for i, k in enumerate(keys)])
+        self.assertEqual(tree["model"]["layers"]["0"]["attn"]["q"], {"weight": 0, "bias": 1})
+        self.assertEqual(tree["lm_head"], 6)
+
+    def test_leaf_and_subtree_conflicts(self):
+        # 叶子与同名目录冲突时，后出现的覆盖先出现的，与逐个插入一致
+        for order in (["a.b", "a.b.c", "a.b.d"], ["a.b.c", "a.b", "a.b.d"], ["a.b.c", "a.b", "a.e"]):
+            items = [(k, k) for k in order]
+            self.assertEqual(reader.build_tree_from_flat_keys(items), self.build_one_by_one(items))
+        self.assertEqual(reader.build_tree_from_flat_keys([("a.b", 1), ("a.b.c", 2)]), {"a": {"b": {"c": 2}}})
+        self.assertEqual(reader.build_tree_from_flat_keys([]), {})
+
+
+class SafetensorsHeaderTest(TempDirTestCase):
+    def test_header_is_parsed_once(self):
+        path = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(path, {"a.w": torch.rand(4, 4), "a.b": torch.arange(3, dtype=torch.uint8)})
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        with mock.patch.object(reader, "loads_json", wraps=reader.loads_json) as loads:
+            r.get_structure()
+            result = r.get_tensor_data(json.dumps(["a", "w"]))
+        self.assertNotIn("error", result)
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(result["stats"]["shape"], [4, 4])
+
+    def test_loads_json_with_and_without_orjson(self):
+        for has_orjson in {reader.HAS_ORJSON, False}:
+            with mock.patch.object(reader, "HAS_ORJSON", has_orjson):
+                self.assertEqual(reader.loads_json(memoryview(b'{"a": [1, 2]}')), {"a": [1, 2]})
+                self.assertEqual(reader.loads_json(b'{"b": null}'), {"b": None})
+                with self.assertRaises(json.JSONDecodeError):
+                    reader.loads_json(memoryview(b'{"a": '))
+
+    def test_global_index(self):
+        shards = {
+            "model-00001-of-00002.safetensors": {"model.embed": torch.rand(6, 2), "model.layers.0.w": torch.rand(2, 2)},
+            "model-00002-of-00002.safetensors": {"model.layers.1.w": torch.arange(4, dtype=torch.int64)},
+        }
+        weight_map = {}
+        for fname, tensors in shards.items():
+            write_safetensors(os.path.join(self.tmp, fname), tensors)
+            weight_map.update(dict.fromkeys(tensors, fname))
+        # 分片中不存在的 key 仍作为引用列出
+        weight_map["lm_head.weight"] = "model-00002-of-00002.safetensors"
+        index_path = os.path.join(self.tmp, "model.safetensors.index.json")
+        with open(index_path, "w") as f:
+            json.dump({"metadata": {"total_size": 0}, "weight_map": weight_map}, f)
+
+        res = reader.read_global_index(index_path, "model-00001-of-00002.safetensors")
+        self.assertNotIn("error", res)
+        self.assertTrue(res["is_global"])
+        self.assertEqual(res["total_size"], sum(os.path.getsize(os.path.join(self.tmp, n)) for n in os.listdir(self.tmp)))
+        tree = res["data"]
+        self.assertEqual(tree["model"]["embed"], {"dtype": "F32", "shape": [6, 2], "_type": "tensor_ref", "location": "Current File"})
+        self.assertEqual(tree["model"]["layers"]["1"]["w"]["location"], "File: model-00002-of-00002.safetensors")
+        self.assertEqual(tree["model"]["layers"]["1"]["w"]["dtype"], "I64")
+        self.assertEqual(tree["lm_head"]["weight"], {"_type": "tensor_ref", "location": "File: model-00002-of-00002.safetensors"})
+        self.assertTrue(gc.isenabled())
+
+    def test_gc_paused_nesting(self):
+        self.assertTrue(gc.isenabled())
+        with reader.gc_paused():
+            with reader.gc_paused():
+                self.assertFalse(gc.isenabled())
+            self.assertFalse(gc.isenabled())
+        self.assertTrue(gc.isenabled())
+        gc.disable()
+        try:
+            with reader.gc_paused():
+                pass
+            # 进入前已关闭的 GC 不被打开
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+
+
+class TensorStatsTest(unittest.TestCase):
+    def test_large_tensor_mean_is_strided_sample(self):
+        with mock.patch.object(reader, "STATS_SAMPLE_THRESHOLD", 1000), \
+                mock.patch.object(reader, "STATS_SAMPLE_SIZE", 100):
+            # numpy 路径 (float32) 与 torch 路径 (int64 / float16)
+            for dtype in (torch.float32, torch.int64, torch.float16):
+                t = torch.arange(10_000).reshape(100, 100).to(dtype)
+                # 极值不在采样点上，仍应精确
+                t[0, 1], t[0, 7] = -50, 20_000
+                stats = reader.format_tensor_stats(t)["stats"]
+                self.assertTrue(stats["sampled"])
+                self.assertEqual((stats["min"], stats["max"]), (-50, 20_000))
+                sample = t.reshape(-1)[::100].double()
+                self.assertAlmostEqual(stats["mean"], sample.mean().item(), places=2)
+                self.assertAlmostEqual(stats["std"], sample.std().item(), delta=stats["std"] * 1e-3)
+
+            small = reader.format_tensor_stats(torch.arange(1000, dtype=torch.float32))["stats"]
+            self.assertNotIn("sampled", small)
+            self.assertEqual(small["mean"], 499.5)
+
+    def test_numpy_path_matches_torch(self):
+        t = torch.randn(64, 33, dtype=torch.float64)
+        self.assertIsNotNone(reader._numpy_stats_view(t))
+        # 非连续视图不走 numpy
+        self.assertIsNone(reader._numpy_stats_view(t.t()))
+        for tensor in (t, t.float(), t.t(), torch.tensor([2.5])):
+            stats = reader.format_tensor_stats(tensor)["stats"]
+            ref = tensor.double()
+            self.assertAlmostEqual(stats["min"], ref.min().item(), places=5)
+            self.assertAlmostEqual(stats["max"], ref.max().item(), places=5)
+            self.assertAlmostEqual(stats["mean"], ref.mean().item(), places=5)
+            if tensor.numel() > 1:
+                self.assertAlmostEqual(stats["std"], ref.std().item(), places=5)
+            else:
+                self.assertIsNone(stats["std"])
+
+    def test_non_finite_values_do_not_warn(self):
+        inf = float("inf")
+        # 分别触发 numpy 的 invalid (inf - inf) 与 overflow (求和溢出)
+        for values in ([1.0, inf], [inf, -inf], [3e38, 3e38, 1.0]):
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                stats = reader.format_tensor_stats(torch.tensor(values))["stats"]
+            self.assertIsNone(stats["std"])
+
+
+class SafetensorsBatchTest(TempDirTestCase):
+    def test_reads_in_file_order_between_advice(self):
+        path = os.path.join(self.tmp, "m.safetensors")
+        # 文件中的顺序与 key 字母序不同；m 不在请求中，前后两段不合并
+        write_safetensors(path, {"z": torch.rand(300), "m": torch.rand(5000), "a": torch.rand(7), "b": torch.arange(9, dtype=torch.int64)})
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        keys = [json.dumps(["b"]), json.dumps(["missing"]), "z", json.dumps(["a"])]
+        expected = [r.get_tensor_data(k) for k in keys]
+        r.stats_cache.clear()
+
+        events = []
+        get_tensor_data = r.get_tensor_data
+        with mock.patch.object(r, "_advise_range", side_effect=lambda *args: events.append(args)), \
+                mock.patch.object(r, "get_tensor_data", side_effect=lambda k: events.append(("read", k)) or get_tensor_data(k)):
+            results = r.get_tensor_data_batch(keys)
+
+        # 结果按请求顺序返回，与逐个查看一致
+        self.assertEqual(results, expected)
+        self.assertIn("error", results[1])
+        offsets = r.tensor_offsets
+        z, a, b = offsets["z"], offsets["a"], offsets["b"]
+        self.assertEqual(events, [
+            ("MADV_SEQUENTIAL", z[0], z[1]),
+            ("MADV_SEQUENTIAL", a[0], b[1]),
+            # 找不到的 key 最先处理，其余按数据偏移读取
+            ("read", keys[1]), ("read", keys[2]), ("read", keys[3]), ("read", keys[0]),
+            ("MADV_DONTNEED", z[0], z[1]),
+            ("MADV_DONTNEED", a[0], b[1]),
+        ])
+
+    def test_advise_unaligned_range(self):
+        path = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(path, {"a": torch.rand(3), "b": torch.rand(5000)})
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        r.load()
+        # 起点不在页边界上：向下取整到页，不抛异常
+        start, end = r.tensor_offsets["b"]
+        self.assertNotEqual((r.data_base + start) % mmap.PAGESIZE, 0)
+        for option in ("MADV_SEQUENTIAL", "MADV_DONTNEED", "MADV_NOT_A_FLAG"):
+            r._advise_range(option, start, end)
+        self.assertEqual(r.get_tensor_data(json.dumps(["b"]))["stats"]["shape"], [5000])
+
+
+class LeafIndexTest(TempDirTestCase):
+    def assert_idx_lookup(self, r, structure):
+        leaves = list(iter_leaves(structure))
+        self.assertGreater(len(leaves), 1)
+        # 编号按出现顺序分配
+        self.assertEqual([idx for idx, _ in leaves], list(range(len(leaves))))
+        for idx, keys in leaves:
+            expected = r.get_tensor_data(json.dumps(keys))
+            self.assertNotIn("error", expected)
+            self.assertEqual(r.get_tensor_data(json.dumps({"_idx": idx, "keys": keys})), expected)
+            self.assertEqual(r.get_tensor_data({"_idx": idx}), expected)
+            # 过期的编号与 keys 不符时按 key 路径查找
+            stale = (idx + 1) % len(leaves)
+            self.assertEqual(r.get_tensor_data(json.dumps({"_idx": stale, "keys": keys})), expected)
+
+    def test_torch_idx_lookup(self):
+        path = os.path.join(self.tmp, "ckpt.pth")
+        torch.save({
+            "model": torch.nn.Sequential(torch.nn.Linear(4, 3), torch.nn.ReLU(), torch.nn.Linear(3, 2)).state_dict(),
+            "lst": [torch.arange(3), 1.5, None],
+            "one": torch.tensor([2.0]),
+        }, path)
+        r = reader.TorchReader(path)
+        self.assert_idx_lookup(r, r.get_structure(export_full_artifacts=False))
+        # 编号不可用又没有 keys：报出请求的 key
+        with self.assertRaisesRegex(KeyError, "leaf index 99"):
+            r.get_tensor_data(json.dumps({"_idx": 99}))
+        with self.assertRaisesRegex(KeyError, "Key not found"):
+            r.get_tensor_data(json.dumps({"keys": "model.0.weight"}))
+
+    def test_safetensors_idx_lookup(self):
+        path = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(path, {
+            "model.layers.0.w": torch.rand(3, 4),
+            "model.layers.1.w": torch.rand(2),
+            "model.embed": torch.arange(6, dtype=torch.int64).reshape(2, 3),
+        })
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        self.assert_idx_lookup(r, r.get_structure())
+        self.assertIn("leaf index 99", r.get_tensor_data(json.dumps({"_idx": 99}))["error"])
+
+
+class CacheLockTest(TempDirTestCase):
+    def test_lru_caches_under_concurrent_inspects(self):
+        path = os.path.join(self.tmp, "ckpt.pth")
+        torch.save({f"t{i}": torch.rand(16) for i in range(32)}, path)
+        r = reader.TorchReader(path)
+        r.get_structure(export_full_artifacts=False)
+        keys = [json.dumps([f"t{i}"]) for i in range(32)]
+        expected = {k: r.get_tensor_data(k)["stats"] for k in keys}
+        errors = []
+
+        def worker(offset):
+            try:
+                for n in range(200):
+                    k = keys[(offset + n * 7) % len(keys)]
+                    self.assertEqual(r.get_tensor_data(k)["stats"], expected[k])
+            except Exception as e:
+                errors.append(e)
+
+        switch = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(switch)
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(r.tensor_cache), r.TENSOR_CACHE_SIZE)
+
+    def test_stats_cache_access_waits_for_lock(self):
+        path = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(path, {"w": torch.rand(8)})
+        r = reader.SafetensorsReader(path)
+        self.addCleanup(r.close)
+        results = []
+        with r.cache_lock:
+            t = threading.Thread(target=lambda: results.append(r.get_tensor_data(json.dumps(["w"]))))
+            t.start()
+            t.join(0.3)
+            self.assertTrue(t.is_alive())
+        t.join(10)
+        self.assertIn("stats", results[0])
+        self.assertIn("w", r.stats_cache)
+
+
+class NetworkPathTest(TempDirTestCase):
+    MOUNTS = (
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "server:/export /mnt/nfs nfs4 rw 0 0\n"
+        "/dev/sdb1 /mnt/nfs/local ext4 rw 0 0\n"
+        "host:/share /mnt/my\\040share cifs rw 0 0\n"
+    )
+
+    def test_is_network_path(self):
+        self.assertTrue(reader.is_network_path("\\\\server\\share\\model.pth"))
+        with mock.patch("builtins.open", mock.mock_open(read_data=self.MOUNTS)), \
+                mock.patch.object(reader.os.path, "realpath", side_effect=lambda p: p):
+            self.assertTrue(reader.is_network_path("/mnt/nfs/model.pth"))
+            self.assertTrue(reader.is_network_path("/mnt/my share/model.pth"))
+            # 取最长匹配的挂载点
+            self.assertFalse(reader.is_network_path("/mnt/nfs/local/model.pth"))
+            self.assertFalse(reader.is_network_path("/mnt/nfsx/model.pth"))
+            self.assertFalse(reader.is_network_path("/home/model.pth"))
+
+    def load_calls(self, path, allow_unsafe=False):
+        """在 "网络文件系统" 上 load()，返回 torch.load 每次调用的第一个参数"""
+        r = reader.TorchReader(path)
+        r.set_allow_unsafe(allow_unsafe)
+        sources = []
+        real_load = torch.load
+
+        def spy(f, *args, **kwargs):
+            sources.append((f, kwargs.get("mmap", False)))
+            return real_load(f, *args, **kwargs)
+
+        with mock.patch.object(reader, "is_network_path", return_value=True), \
+                mock.patch.object(reader.torch, "load", side_effect=spy):
+            r.load()
+        self.assertIsNotNone(r.content)
+        return sources
+
+    @unittest.skipUnless(reader.TORCH_SUPPORTS_MMAP, "torch.load(mmap=True) not supported")
+    def test_zip_checkpoint_is_still_mapped(self):
+        path = os.path.join(self.tmp, "ckpt.pth")
+        torch.save({"w": torch.rand(16, 16)}, path)
+        self.assertEqual(self.load_calls(path), [(path, True)])
+
+    def test_legacy_checkpoint_is_read_once(self):
+        path = os.path.join(self.tmp, "legacy.pth")
+        torch.save(torch.nn.Linear(3, 2), path, _use_new_zipfile_serialization=False)
+        sources = self.load_calls(path, allow_unsafe=True)
+        # weights_only 被拒绝后的回退复用同一份内存 buffer
+        self.assertEqual(len(sources), 2)
+        self.assertIsInstance(sources[0][0], io.BytesIO)
+        self.assertIs(sources[0][0], sources[1][0])
+
+    def test_large_legacy_checkpoint_is_not_bulk_read(self):
+        path = os.path.join(self.tmp, "legacy.pth")
+        torch.save({"w": torch.rand(4)}, path, _use_new_zipfile_serialization=False)
+        with mock.patch.object(reader, "BULK_READ_MAX_BYTES", 0):
+            self.assertEqual(self.load_calls(path), [(path, False)])
+
+
+class _FakeArrayMetadata:
+    """Orbax ArrayMetadata 占位：只带 shape / dtype"""
+    def __init__(self, shape, dtype="float32"):
+        self.shape = shape
+        self.dtype = dtype
+
+
+class _FakeTreeMetadata(collections.abc.Mapping):
+    """新版 Orbax 的 TreeMetadata：类 Mapping 对象 (不是 dict)，树在 .tree 里"""
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __getitem__(self, key):
+        return self.tree[key]
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def __len__(self):
+        return len(self.tree)
+
+
+class JaxMetadataTest(unittest.TestCase):
+    """不依赖 JAX：替换掉真正读盘的 _restore_leaf / load_full，只验证结构遍历和取数逻辑"""
+
+    def setUp(self):
+        self.r = reader.JaxReader("/nonexistent/checkpoint")
+        self.r.metadata = {"params": {"dense": {"kernel": _FakeArrayMetadata((2, 2)), "bias": _FakeArrayMetadata((2,))}}}
+        patches = [
+            mock.patch.object(reader, "HAS_ORBAX_PLACEHOLDER", True),
+            mock.patch.object(self.r, "_restore_leaf", side_effect=lambda meta: torch.ones(meta.shape)),
+            mock.patch.object(self.r, "load_full", side_effect=AssertionError("load_full called")),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_step_metadata_is_unwrapped(self):
+        tree = {"params": {"w": _FakeArrayMetadata((3,))}}
+        step_metadata = types.SimpleNamespace(item_metadata=_FakeTreeMetadata(tree))
+        self.assertIs(reader._jax_metadata_tree(step_metadata), tree)
+        self.assertIs(reader._jax_metadata_tree(tree), tree)
+
+    def test_mapping_containers_are_walked(self):
+        self.r.metadata = _FakeTreeMetadata({"params": _FakeTreeMetadata({"w": _FakeArrayMetadata((3,))})})
+        self.assertEqual(self.r.get_structure(), {
+            "w": {"_type": "tensor", "dtype": "float32", "shape": [3], "location": "JAX Checkpoint"},
+        })
+        self.assertEqual(self.r.get_tensor_data(json.dumps(["w"]))["stats"]["shape"], [3])
+
+    def test_restores_only_the_requested_leaf(self):
+        result = self.r.get_tensor_data(json.dumps(["dense", "kernel"]))
+        self.assertEqual(result["stats"]["shape"], [2, 2])
+        self.assertEqual(self.r._restore_leaf.call_count, 1)
+        # 再次查看命中叶子缓存
+        self.r.get_tensor_data(json.dumps(["dense", "kernel"]))
+        self.assertEqual(self.r._restore_leaf.call_count, 1)
+
+    def test_bad_or_non_leaf_keys_do_not_restore(self):
+        self.assertIn("error", self.r.get_tensor_data(json.dumps(["dense"])))
+        self.assertIn("error", self.r.get_tensor_data(json.dumps(["missing"])))
+        self.assertEqual(self.r._restore_leaf.call_count, 0)
+
+    def test_leaf_cache_is_bounded(self):
+        n = reader.JaxReader.LEAF_CACHE_SIZE + 4
+        self.r.metadata = {"params": {str(i): _FakeArrayMetadata((1,)) for i in range(n)}}
+        for i in range(n):
+            self.r.get_tensor_data(json.dumps([str(i)]))
+        self.assertEqual(len(self.r.leaf_cache), reader.JaxReader.LEAF_CACHE_SIZE)
+        self.r.close()
+        self.assertEqual(len(self.r.leaf_cache), 0)
+
+
+@unittest.skipUnless(reader.HAS_JAX, "JAX/Orbax not installed")
+class OrbaxCheckpointTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        import jax.numpy as jnp
+        import orbax.checkpoint as ocp
+        self.path = os.path.join(self.tmp, "ckpt")
+        tree = {
+            "params": {"dense": {"kernel": jnp.arange(6.0).reshape(2, 3), "bias": jnp.zeros(3)}, "layers": [jnp.ones(2), {"w": jnp.arange(4.0)}]},
+            "step": 5,
+        }
+        with ocp.PyTreeCheckpointer() as ckptr:
+            ckptr.save(self.path, tree)
+
+    def full_reader(self):
+        r = reader.JaxReader(self.path)
+        r.load_full()
+        return r
+
+    def test_metadata_walk_matches_full_restore(self):
+        full = self.full_reader()
+        self.assertEqual(reader.JaxReader(self.path).get_structure(), full._recursive_summary(full.content))
+
+    def test_single_leaf_restore_matches_full_restore(self):
+        full = self.full_reader()
+        r = reader.JaxReader(self.path)
+        keys = json.dumps(["dense", "kernel"])
+        with mock.patch.object(r, "load_full", side_effect=AssertionError("load_full called")):
+            result = r.get_tensor_data(keys)
+            self.assertIn("error", r.get_tensor_data(json.dumps(["dense"])))
+        self.assertEqual(result, full.get_tensor_data(keys))
+
+
+if __name__ == "__main__":
+    unittest.main()
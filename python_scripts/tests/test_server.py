@@ -0,0 +1,260 @@
+"""
+server.py 的冒烟测试，测试数据都在临时目录中生成。
+运行: python -m unittest discover -s python_scripts/tests
+"""
+import asyncio
+import http.client
+import http.server
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import reader  # noqa: E402
+import server  # noqa: E402
+from test_reader import iter_leaves, write_safetensors  # noqa: E402
+
+
+def request(path, payload):
+    status, body = server.handle_request(path, payload)
+    return status, json.loads(body)
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.ckpt = os.path.join(self.tmp, "ckpt.pth")
+        torch.save({"model": torch.nn.Linear(4, 3).state_dict(), "step": 3}, self.ckpt)
+        self.st = os.path.join(self.tmp, "m.safetensors")
+        write_safetensors(self.st, {"a.w": torch.rand(64, 64), "a.b": torch.rand(64), "c": torch.arange(5, dtype=torch.int64)})
+
+    def tearDown(self):
+        for file_path in list(server.LOADED_MODELS):
+            server.handle_request("/release", {"file_path": file_path})
+        server._shutdown_inspect_pool()
+        with server.TIMER_LOCK:
+            if server.SHUTDOWN_TIMER is not None:
+                server.SHUTDOWN_TIMER.cancel()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def load(self, file_path):
+        status, res = request("/load", {"file_path": file_path, "cache_dir": self.tmp})
+        self.assertEqual(status, 200)
+        self.assertNotIn("error", res)
+        return res
+
+
+class LoadTest(ServerTestCase):
+    def test_repeated_load_reuses_serialized_response(self):
+        first = self.load(self.ckpt)
+        _, second = server.handle_request("/load", {"file_path": self.ckpt, "cache_dir": self.tmp})
+        _, third = server.handle_request("/load", {"file_path": self.ckpt, "cache_dir": self.tmp})
+        self.assertIs(second, third)
+        self.assertEqual(json.loads(second)["data"], first["data"])
+        # 参数变化时重新生成响应
+        _, other = server.handle_request("/load", {"file_path": self.ckpt, "cache_dir": self.tmp, "allow_unsafe": True})
+        self.assertIsNot(other, third)
+
+    def test_response_cache_is_read_under_reader_lock(self):
+        self.load(self.st)
+        r = server.LOADED_MODELS[self.st]
+        results = []
+        # 其他线程持有锁时，重复 /load 等待而不是读到写了一半的缓存
+        with r.cache_lock:
+            t = threading.Thread(target=lambda: results.append(
+                server.handle_request("/load", {"file_path": self.st, "cache_dir": self.tmp})))
+            t.start()
+            t.join(0.3)
+            self.assertTrue(t.is_alive())
+        t.join(10)
+        self.assertEqual(results[0][0], 200)
+
+
+class InspectTest(ServerTestCase):
+    def test_inspect_by_leaf_index(self):
+        for file_path in (self.ckpt, self.st):
+            leaves = list(iter_leaves(self.load(file_path)["data"]))
+            for idx, keys in leaves:
+                _, by_keys = request("/inspect", {"file_path": file_path, "key": json.dumps(keys)})
+                _, by_idx = request("/inspect", {"file_path": file_path, "key": json.dumps({"_idx": idx, "keys": keys})})
+                self.assertNotIn("error", by_keys)
+                self.assertEqual(by_idx, by_keys)
+                # 编号与 keys 不符 (前端缓存过期) 时按 keys 查找
+                stale = {"_idx": (idx + 1) % len(leaves), "keys": keys}
+                _, by_stale = request("/inspect", {"file_path": file_path, "key": json.dumps(stale)})
+                self.assertEqual(by_stale, by_keys)
+
+    def test_inspect_batch_keeps_request_order(self):
+        for file_path, keys in ((self.st, [["c"], ["a", "w"], ["missing"], ["a", "b"]]),
+                                (self.ckpt, [["model", "bias"], ["missing"], ["model", "weight"]])):
+            self.load(file_path)
+            # 每个 key 可以是 JSON 字符串 (同 /inspect) 或列表
+            batch = [json.dumps(k) if i % 2 else k for i, k in enumerate(keys)]
+            _, res = request("/inspect_batch", {"file_path": file_path, "keys": batch})
+            results = res["results"]
+            self.assertFalse(res["reloaded_from_disk"])
+            self.assertEqual(len(results), len(keys))
+            for key, result in zip(keys, results):
+                if key == ["missing"]:
+                    self.assertIn("error", result)
+                    continue
+                _, single = request("/inspect", {"file_path": file_path, "key": json.dumps(key)})
+                single.pop("reloaded_from_disk", None)
+                self.assertEqual(result, single)
+
+    def test_release_then_inspect_reloads(self):
+        self.load(self.ckpt)
+        _, res = request("/release", {"file_path": self.ckpt})
+        self.assertEqual(res["status"], "released")
+        self.assertNotIn(self.ckpt, server.LOADED_MODELS)
+        _, res = request("/inspect_batch", {"file_path": self.ckpt, "keys": [["model", "weight"]]})
+        self.assertTrue(res["reloaded_from_disk"])
+        self.assertEqual(res["results"][0]["stats"]["shape"], [3, 4])
+        _, res = request("/inspect", {"file_path": self.ckpt, "key": json.dumps(["model", "bias"])})
+        self.assertFalse(res["reloaded_from_disk"])
+
+
+class KeepAliveTest(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), server.RequestHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        super().tearDown()
+
+    def test_requests_reuse_connection_without_nagle_delay(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1])
+        body = json.dumps({"file_path": self.st})
+        timings = []
+        sock = None
+        try:
+            for _ in range(20):
+                start = time.perf_counter()
+                conn.request("POST", "/model_status", body=body)
+                resp = conn.getresponse()
+                resp.read()
+                timings.append(time.perf_counter() - start)
+                self.assertEqual(resp.status, 200)
+                if sock is None:
+                    sock = conn.sock
+                # HTTP/1.1：同一个 TCP 连接
+                self.assertIs(conn.sock, sock)
+        finally:
+            conn.close()
+        # Nagle + 延迟 ACK 会让每个请求多等约 40ms
+        self.assertLess(sorted(timings)[len(timings) // 2], 0.02)
+
+
+class AsgiAppTest(ServerTestCase):
+    def call(self, method, path, chunks):
+        """不依赖 uvicorn，直接驱动 asgi_app，返回 (status, headers, body)"""
+        messages = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1}
+                    for i, c in enumerate(chunks)]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(server.asgi_app({"type": "http", "method": method, "path": path}, receive, send))
+        start, body = sent
+        return start["status"], dict(start["headers"]), body["body"]
+
+    def test_matches_handle_request(self):
+        payload = json.dumps({"file_path": self.st, "cache_dir": self.tmp}).encode()
+        # 请求体分多段到达
+        status, headers, body = self.call("POST", "/load", [payload[:10], payload[10:]])
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-length"], str(len(body)).encode())
+        self.assertEqual(headers[b"content-type"], b"application/json")
+        self.assertEqual(json.loads(body)["data"], self.load(self.st)["data"])
+
+        self.assertEqual(self.call("POST", "/load", [b"not json"])[0], 400)
+        self.assertEqual(self.call("GET", "/load", [b""])[:2], (501, {b"content-length": b"0"}))
+
+
+class InspectPoolTest(ServerTestCase):
+    KEY = json.dumps(["a", "w"])
+
+    def setUp(self):
+        super().setUp()
+        # 所有 Tensor 都走进程池
+        patcher = mock.patch.object(reader, "PROCESS_INSPECT_MIN_BYTES", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_until(self, condition, message, timeout=60):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail(message)
+            time.sleep(0.05)
+
+    def start_pool(self, r):
+        """首次请求在当前进程内计算，同时在后台启动进程池；等待其就绪"""
+        result = server._inspect_tensor(r, self.KEY)
+        self.assertNotIn("error", result)
+        self.assertIsNotNone(server.INSPECT_POOL)
+        self.wait_until(lambda: server.INSPECT_POOL_READY, "inspect pool did not become ready")
+        return result, server.INSPECT_POOL
+
+    def test_offload_and_crash_recovery(self):
+        self.load(self.st)
+        r = server.LOADED_MODELS[self.st]
+        expected, pool = self.start_pool(r)
+        self.assertLessEqual(len(pool._processes), server.INSPECT_POOL_WORKERS)
+
+        # 就绪后交给 worker 计算，统计量回填到主进程缓存
+        r.stats_cache.clear()
+        with mock.patch.object(r, "get_tensor_data", side_effect=AssertionError("computed in-process")):
+            self.assertEqual(server._inspect_tensor(r, self.KEY), expected)
+        self.assertIn("a.w", r.stats_cache)
+
+        if not hasattr(signal, "SIGKILL"):
+            return
+        # worker 崩溃：本次回退到当前进程，并丢弃损坏的进程池
+        os.kill(pool.submit(os.getpid).result(), signal.SIGKILL)
+        r.stats_cache.clear()
+        self.assertEqual(server._inspect_tensor(r, self.KEY), expected)
+        self.assertIsNot(server.INSPECT_POOL, pool)
+        # 下次请求重新创建
+        r.stats_cache.clear()
+        self.start_pool(r)
+
+    def test_pool_outlives_partial_release(self):
+        self.load(self.st)
+        self.load(self.ckpt)
+        _, pool = self.start_pool(server.LOADED_MODELS[self.st])
+        workers = list(pool._processes.values())
+
+        # 还有其他文件打开时保留进程池
+        _, res = request("/release", {"file_path": self.ckpt})
+        self.assertEqual(res["status"], "released")
+        self.assertIs(server.INSPECT_POOL, pool)
+
+        # 最后一个文件释放时关闭，且不等待正在进行的统计
+        pool.submit(time.sleep, 3)
+        start = time.monotonic()
+        request("/release", {"file_path": self.st})
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIsNone(server.INSPECT_POOL)
+        self.wait_until(lambda: not any(p.is_alive() for p in workers), "inspect worker did not exit")
+
+
+if __name__ == "__main__":
+    unittest.main()
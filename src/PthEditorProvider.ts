@@ -442,9 +442,13 @@ export class PthEditorProvider implements vscode.CustomReadonlyEditorProvider<Pt
             if (!modelStatus?.loaded_in_memory) {
                 vscode.window.showInformationMessage(t('dynamic_reloading_memory_notice'));
             }
+            // 结构摘要里带有叶子编号 _idx 时一并发送，Server 端可直接按编号定位；keys 用于编号失效时回退
+            const requestKey = (targetNode && typeof targetNode._idx === 'number')
+                ? JSON.stringify({ _idx: targetNode._idx, keys: keys })
+                : key;
             const result = await PythonServerManager.getInstance().sendRequest('/inspect', {
                 file_path: filePath,
-                key: key, // 直接传 JSON 字符串，Server 端会解析
+                key: requestKey, // 直接传 JSON 字符串，Server 端会解析
                 allow_unsafe: state.allowUnsafeLoadForCurrentFile,
             });
             if (result.error) {
@@ -2147,7 +2151,10 @@ export function generateJsonHtml(data: any, keyPath: string[] = [], fullStructur
         // 3. 生成唯一 ID (CSS ID 不能有特殊字符，这里简单的替换一下即可，或者用 safePath 做 ID 的一部分)
         const btnId = `btn-${safePath.replace(/[^a-zA-Z0-9]/g, '-')}`; 
 
-        const detailStr = data._type === 'tensor' ? `${shapeStr} (${dtype})` : `${t('tag_ref')}`;
+        // 索引引用如果带有分片 header 中的 shape/dtype，也一并显示
+        const detailStr = data._type === 'tensor'
+            ? `${shapeStr} (${dtype})`
+            : (data.shape ? `${shapeStr} (${dtype}) ${t('tag_ref')}` : `${t('tag_ref')}`);
         
         // 注意：onclick 这里我们要传 safePath，后端拿到后再 decodeURIComponent
         // 但其实 postMessage 可以直接传对象，我们这里为了简单，传 safePath 字符串
@@ -2254,7 +2261,7 @@ export function generateJsonHtml(data: any, keyPath: string[] = [], fullStructur
         hasChildren = false;
     } else if (typeof data === 'object' && data !== null) {
         let listItems = '';
-        const objectKeys = Object.keys(data).filter(k => !['_type', 'dtype', 'shape', 'location'].includes(k));
+        const objectKeys = Object.keys(data).filter(k => !['_type', 'dtype', 'shape', 'location', '_idx'].includes(k));
         const dictMarkerIndex = objectKeys.findIndex(
             k => k.startsWith('__pth__truncated__') && k.endsWith('__pth__truncated__')
         );